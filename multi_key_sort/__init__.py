@@ -8,6 +8,99 @@
     GitHub: https://github.com/48-41-50
 """
 
+import heapq
+import locale
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple, deque, Counter, OrderedDict
+try:
+    from collections import UserList
+except ImportError:
+    from UserList import UserList
+try:
+    from collections.abc import Sequence, MutableSequence
+except ImportError:
+    from collections import Sequence, MutableSequence
+try:
+    from functools import lru_cache
+except ImportError:
+    # Python 2: compiled accessors are rebuilt on every call
+    def lru_cache(maxsize):
+        return lambda function: function
+from itertools import chain, compress, count, islice
+from operator import itemgetter as _itemgetter, attrgetter as _attrgetter, lt
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+try:
+    from time import perf_counter
+except ImportError:
+    from time import time as perf_counter
+
+from multi_key_sort import columnar
+from multi_key_sort.profiling import (sort_hooks, SortProfile, add_sort_hook, remove_sort_hook, 
+                                      profile_sorts, emit as emit_sort_profile)
+
+_MULTI_FIELD_GETTERS = (_itemgetter, _attrgetter)
+
+try:
+    _move_to_end = OrderedDict.move_to_end
+except AttributeError:
+    # Python 2
+    def _move_to_end(ordered, key):
+        ordered[key] = ordered.pop(key)
+
+
+_NATURAL_SPLIT = re.compile(r'(\d+)')
+
+
+def natural_key(value):
+    """    natural_key(value) -> tuple
+    
+    Split a string into text and integer parts so that embedded numbers 
+    compare by value: 'v1.10' sorts after 'v1.9'. Text parts and integer 
+    parts alternate, starting with a (possibly empty) text part, so the 
+    tuples of any two strings can be compared.
+    """
+    
+    parts = _NATURAL_SPLIT.split(value)
+    parts[1::2] = map(int, parts[1::2])
+    
+    return tuple(parts)
+# End natural_key
+
+
+try:
+    _casefold = str.casefold
+except AttributeError:
+    # Python 2
+    def _casefold(value):
+        return value.lower()
+
+
+# Keyspec modifiers: the transform applied to each key value before it is 
+# compared. More can be registered by name.
+KEY_MODIFIERS = {
+    'ci': _casefold,
+    'locale': locale.strxfrm,
+    'natural': natural_key,
+}
+
+
+TransformedKey = namedtuple('TransformedKey', 'key modifier')
+
+
+def _strip_modifier(myKey):
+    for name in KEY_MODIFIERS:
+        if myKey.endswith(' ' + name):
+            return myKey[:-len(name) - 1], name
+    # End for
+    
+    return myKey, None
+# End _strip_modifier
+
+
 def ResolveKeys(keyspec):
     """    ResolveKeys(keyspec) -> (key, doReverse)
     
@@ -24,11 +117,19 @@ def ResolveKeys(keyspec):
     If the key is a string of digits, then an integer conversion is performed.
     
     The default is reverse = False
+    
+    A keyspec may also end with the name of a modifier from KEY_MODIFIERS, 
+    before or after a direction suffix: 'name ci', '-name locale', 
+    'version natural desc'. The key is then returned as TransformedKey(key, 
+    modifier) and its values are compared after the transform ('ci' 
+    casefolds, 'locale' applies locale.strxfrm, 'natural' orders embedded 
+    numbers by value).
     """
      
     for key in reversed(keyspec):
         doReverse = False
         myKey = str(key)
+        myKey, modifier = _strip_modifier(myKey)
         
         if myKey.startswith('+'):
             doReverse = False
@@ -46,12 +147,18 @@ def ResolveKeys(keyspec):
             myKey = myKey[:-5]
             doReverse = True
         
+        if modifier is None:
+            myKey, modifier = _strip_modifier(myKey)
+        
         if myKey.isdigit():
             try:
                 myKey = int(myKey)
             except:
                 pass
         
+        if modifier is not None:
+            myKey = TransformedKey(myKey, modifier)
+        
         yield (myKey, doReverse)
     # End for
 # End ResolveKeys
@@ -78,7 +185,805 @@ def flatten_all(obj, res=None):
     
     return res
 # End flatten_all
+
+
+def split_path(key):
+    """    split_path(key) -> tuple of path parts
+    
+    Split a dotted itemgetter key into the keys to look up in turn. Parts 
+    that are strings of digits become integers so that list items can be 
+    indexed. A backslash escapes a literal dot (or backslash) in a key.
+    
+    Ex:
+        split_path('customer.address.city') -> ('customer', 'address', 'city')
+        split_path('items.0.price') -> ('items', 0, 'price')
+        split_path('version\\.major') -> ('version.major',)
+    """
+    
+    if not isinstance(key, str) or ('.' not in key and '\\' not in key):
+        return (key,)
+    
+    parts = []
+    part = []
+    escaped = False
+    for c in key:
+        if escaped:
+            part.append(c)
+            escaped = False
+        elif c == '\\':
+            escaped = True
+        elif c == '.':
+            parts.append(''.join(part))
+            part = []
+        else:
+            part.append(c)
+    # End for
+    parts.append(''.join(part))
+    
+    return tuple(int(x) if x.isdigit() else x for x in parts)
+# End split_path
+
+
+@lru_cache(maxsize=1024)
+def _compile_item_paths(paths):
+    """    Compile a function looking up every path in paths (tuples from 
+    split_path) with plain subscripts: one value for a single path, a tuple 
+    otherwise.
+    """
+    
+    lookups = ['r' + ''.join('[{0!r}]'.format(x) for x in path) for path in paths]
+    if len(lookups) == 1:
+        source = 'lambda r: ' + lookups[0]
+    else:
+        source = 'lambda r: (' + ', '.join(lookups) + ',)'
+    
+    return eval(source, {})
+# End _compile_item_paths
+
+
+def _tuple_getter(getters):
+    return lambda record: tuple(g(record) for g in getters)
+# End _tuple_getter
+
+
+def _transformed_getter(getter, key):
+    fetch = fields_getter(getter, (key.key,))
+    transform = KEY_MODIFIERS[key.modifier]
+    
+    return lambda record: transform(fetch(record))
+# End _transformed_getter
+
+
+def fields_getter(getter, keys):
+    """    fields_getter(getter, keys) -> key function or None
+    
+    Return a function that extracts the values of all keys (resolved keys, 
+    without directionals) at once: the value itself for one key, a tuple 
+    otherwise. Dotted itemgetter paths are compiled into a single function 
+    of nested subscripts, other keys use getter(*keys) directly, and the 
+    values of a TransformedKey are passed through its modifier. None is 
+    returned for several keys when getter is not operator.itemgetter or 
+    operator.attrgetter (attrgetter follows dotted names itself).
+    """
+    
+    keys = tuple(keys)
+    
+    if any(isinstance(k, TransformedKey) for k in keys):
+        if len(keys) == 1:
+            return _transformed_getter(getter, keys[0])
+        elif getter in _MULTI_FIELD_GETTERS:
+            return _tuple_getter([fields_getter(getter, (k,)) for k in keys])
+        
+        return None
+    # End transformed
+    
+    if getter is _itemgetter:
+        paths = tuple(split_path(k) for k in keys)
+        if any(len(path) > 1 or path[0] != k for path, k in zip(paths, keys)):
+            return _compile_item_paths(paths)
+    # End itemgetter paths
+    
+    if len(keys) == 1:
+        return getter(keys[0])
+    elif getter in _MULTI_FIELD_GETTERS:
+        return getter(*keys)
+    
+    return None
+# End fields_getter
+    
+
+class _Reversed(object):
+    """    Wraps a key value so that it compares in the opposite order.
+    Used for the descending keys of SortPlan.record_key.
+    """
+    
+    __slots__ = ('value',)
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def __eq__(self, other):
+        if not isinstance(other, _Reversed):
+            return NotImplemented
+        
+        return self.value == other.value
+    
+    def __ne__(self, other):
+        if not isinstance(other, _Reversed):
+            return NotImplemented
+        
+        return self.value != other.value
+    
+    def __lt__(self, other):
+        if not isinstance(other, _Reversed):
+            return NotImplemented
+        
+        return other.value < self.value
+    
+    __hash__ = None
+# End class _Reversed
+
+
+def _compile_record_key(getters, reverses):
+    """    Compile a function building the tuple of every getter's value, 
+    with the reversed ones wrapped in _Reversed. Every value of a reversed 
+    column is wrapped, so values of mixed types (an int next to a Decimal 
+    or a bool) still compare. Spelling the tuple out avoids a generator per 
+    record in heaps and merges.
+    """
+    
+    names = {'_Reversed': _Reversed}
+    items = []
+    for i, (g, r) in enumerate(zip(getters, reverses)):
+        names['g{0}'.format(i)] = g
+        items.append(('_Reversed(g{0}(r))' if r else 'g{0}(r)').format(i))
+    # End for
+    
+    return eval('lambda r: (' + ', '.join(items) + ',)', names)
+# End _compile_record_key
+
+
+def _identity(x):
+    return x
+
+
+# Runs of at least this many same-direction keys are sorted in one pass with 
+# a multi-field getter. Below it, one pass per key is faster in CPython as 
+# list.sort specialises comparisons of plain str/int/float keys but not of 
+# tuples (see python -m multi_key_sort.bench).
+COMPOSITE_MIN_KEYS = 5
+
+
+# A list that is sorted except for a tail of at most 1/TAIL_MERGE_RATIO of its 
+# length has only the tail sorted and spliced in
+TAIL_MERGE_RATIO = 32
+
+# In-place sorts look for a sorted prefix before sorting when the plan has 
+# at least PREFIX_CHECK_MIN_PASSES passes and all of its keys share one 
+# direction. The check builds and compares one key tuple per record, which 
+# costs about as much as three list.sort passes over nearly sorted input 
+# (list.sort finds the runs and specialises comparisons of plain keys), so 
+# it only pays off from four passes on (see python -m multi_key_sort.bench 
+# --orders presorted,tail). As COMPOSITE_MIN_KEYS or more same-direction 
+# keys are sorted in a single pass, this only applies to plans of exactly 
+# four unmodified keys in one direction with itemgetter or attrgetter.
+PREFIX_CHECK_MIN_PASSES = 4
+
+# Keys of the first PREFIX_CHUNK records are checked first when looking for 
+# a sorted prefix, then chunks twice as long each time
+PREFIX_CHUNK = 1024
+
+_sort_path_counts = Counter()
+_sort_path_lock = Lock()
+
+
+def _count_sort_path(path):
+    with _sort_path_lock:
+        _sort_path_counts[path] += 1
+# End _count_sort_path
+
+
+def sort_path_info():
+    """    sort_path_info() -> dict
+    
+    Return how many in-place sorts that checked for a sorted prefix (see 
+    SortPlan.sort_list) took each path since the last sort_path_clear:
+        'presorted'  - the input was already in order
+        'tail_merge' - only a short unsorted tail was sorted and spliced in
+        'full'       - the whole input was sorted
+    """
+    
+    with _sort_path_lock:
+        return dict((p, _sort_path_counts[p]) for p in ('presorted', 'tail_merge', 'full'))
+# End sort_path_info
+
+
+def sort_path_clear():
+    """    Reset the sort_path_info counters.
+    """
+    
+    with _sort_path_lock:
+        _sort_path_counts.clear()
+# End sort_path_clear
+
+
+class SortPlan(object):
+    """    SortPlan(getter, resolved) -> plan for a multi-key sort
+    
+    A SortPlan holds the resolved keys (key, doReverse) in priority order 
+    (most significant key first) and the strategy that will be used to sort:
+    
+        'default'   - no keys, the records are compared directly
+        'composite' - a single pass, either on one key or on all keys at once 
+                      with a multi-field getter
+        'grouped'   - one pass per run of same-direction keys that is long 
+                      enough to combine, one pass per key otherwise
+        'multipass' - one stable pass per key, least significant key first
+    
+    Keys are only combined when the getter is operator.itemgetter or 
+    operator.attrgetter (an arbitrary getter cannot be assumed to accept 
+    several keys at once, see fields_getter) and a run has at least COMPOSITE_MIN_KEYS keys.
+    The passes are kept in the 'passes' attribute as (keyfunc, doReverse) 
+    in the order they are run.
+    
+    When NumPy is installed, inputs of at least columnar.NUMPY_MIN_SIZE 
+    records sorted by at least columnar.NUMPY_MIN_KEYS keys whose columns 
+    are all integers, floats, low-cardinality strings or bytes are sorted 
+    with numpy.lexsort instead (see multi_key_sort.columnar).
+    
+    Plans with a modifier key ('transformed') extract every key column once 
+    and sort record indexes by the columns, so each transform runs exactly 
+    once per record.
+    
+    Every strategy produces the same stable order as one stable pass per 
+    key, provided the key values are totally ordered. Values for which == 
+    and < disagree, such as float('nan'), are an exception: a tuple 
+    comparison stops at the first pair of values that are not ==, so the 
+    combined passes, the sorted prefix check of sort_list and the NumPy 
+    backend can order records holding them differently from separate 
+    passes.
+    """
+    
+    def __init__(self, getter, resolved):
+        self.getter = getter
+        self.keys = tuple(resolved)
+        self.getters = tuple(fields_getter(getter, (k,)) for k, r in self.keys)
+        self.keyfunc = None
+        self.reverse = False
+        self._record_key = None
+        self.transformed = any(isinstance(k, TransformedKey) for k, r in self.keys)
+        
+        multiField = getter in _MULTI_FIELD_GETTERS
+        
+        # keyfunc and reverse describe the whole order as a single key when 
+        # every key shares a direction; heaps, merges and checks use it
+        if len(self.keys) == 1:
+            self.keyfunc = self.getters[0]
+            self.reverse = self.keys[0][1]
+        elif multiField and len(set(r for k, r in self.keys)) == 1:
+            self.keyfunc = fields_getter(getter, [k for k, r in self.keys])
+            self.reverse = self.keys[0][1]
+        # End single key
+        
+        runs = []
+        for (k, r), g in zip(self.keys, self.getters):
+            if runs and runs[-1][1] == r:
+                runs[-1][0].append((k, g))
+            else:
+                runs.append(([(k, g)], r))
+        # End for
+        
+        passes = []
+        for run, r in reversed(runs):
+            if multiField and len(run) >= COMPOSITE_MIN_KEYS:
+                passes.append((fields_getter(getter, [k for k, g in run]), r))
+            else:
+                passes.extend((g, r) for k, g in reversed(run))
+        # End for
+        self.passes = tuple(passes)
+        
+        if not self.keys:
+            self.strategy = 'default'
+        elif len(self.passes) == 1:
+            self.strategy = 'composite'
+        elif len(self.passes) < len(self.keys):
+            self.strategy = 'grouped'
+        else:
+            self.strategy = 'multipass'
+        
+        # Only plans sorted in several passes whose whole order is a single 
+        # key function gain from the prefix check: a single pass finds sorted 
+        # runs by itself, comparing mixed-direction keys costs about as much 
+        # as the passes and a transformed plan would run its transforms twice
+        self._checks_prefix = (len(self.passes) >= PREFIX_CHECK_MIN_PASSES and self.keyfunc is not None 
+                               and not self.transformed)
+    # End __init__
+    
+    def __repr__(self):
+        return 'SortPlan({0!r}, {1!r}, strategy={2!r})'.format(
+            getattr(self.getter, '__name__', self.getter), self.keys, self.strategy)
+    
+    def __eq__(self, other):
+        if not isinstance(other, SortPlan):
+            return NotImplemented
+        
+        return (self.getter, self.keys) == (other.getter, other.keys)
+    
+    def __ne__(self, other):
+        res = self.__eq__(other)
+        
+        return res if res is NotImplemented else not res
+    
+    def __hash__(self):
+        return hash((self.getter, self.keys))
+    
+    @property
+    def record_key(self):
+        """    A key function mapping one record to a value that sorts ascending 
+        in plan order. Descending keys are wrapped in a reversing comparator, 
+        so this is slower than the plan's own sort and is meant for heaps, 
+        merges and bisection.
+        """
+        
+        if self._record_key is None:
+            if not self.keys:
+                self._record_key = _identity
+            elif self.keyfunc is not None and not self.reverse:
+                self._record_key = self.keyfunc
+            elif self.keyfunc is not None:
+                keyfunc = self.keyfunc
+                self._record_key = lambda record: _Reversed(keyfunc(record))
+            else:
+                self._record_key = _compile_record_key(self.getters, [r for k, r in self.keys])
+        # End build
+        
+        return self._record_key
+    # End record_key
+    
+    def sort(self, iterable):
+        """    Return a new list of the records of iterable in plan order.
+        """
+        
+        res = list(iterable)
+        self.sort_list(res)
+        
+        return res
+    # End sort
+    
+    def smallest(self, n, iterable):
+        """    Return a new list of the first n records of iterable in plan order, 
+        equal to self.sort(iterable)[:n], using a bounded heap. n must not be 
+        negative.
+        """
+        
+        if n < 0:
+            raise ValueError("n must not be negative")
+        
+        if self.keyfunc is not None:
+            if self.reverse:
+                return heapq.nlargest(n, iterable, key=self.keyfunc)
+            return heapq.nsmallest(n, iterable, key=self.keyfunc)
+        elif not self.keys:
+            return heapq.nsmallest(n, iterable)
+        
+        return heapq.nsmallest(n, iterable, key=self.record_key)
+    # End smallest
+    
+    def window(self, offset, limit, iterable):
+        """    Return a new list of the records of iterable at positions offset 
+        to offset + limit in plan order, equal to 
+        self.sort(iterable)[offset:offset + limit], using a bounded heap of 
+        offset + limit records.
+        """
+        
+        if offset < 0 or limit < 0:
+            raise ValueError("offset and limit must not be negative")
+        
+        return self.smallest(offset + limit, iterable)[offset:]
+    # End window
+    
+    def following(self, iterable, row):
+        """    Yield the records of iterable that come after row in plan order 
+        (keyset pagination). Records whose keys equal row's follow it only 
+        if they come after row itself (found by identity or equality) in 
+        iterable, as in a stable sort; end the keys with a unique field to 
+        keep pages exact when row may be missing.
+        """
+        
+        key = self.record_key
+        last = key(row)
+        found = False
+        for record in iterable:
+            k = key(record)
+            if last < k:
+                yield record
+            elif k < last:
+                continue
+            elif found:
+                yield record
+            elif record is row or record == row:
+                found = True
+        # End for
+    # End following
+    
+    def sort_list(self, records):
+        """    Sort the list records in place in plan order.
+        
+        list.sort finds presorted input and sorted runs by itself in every 
+        pass. Only plans of exactly four unmodified keys that share one 
+        direction, with itemgetter or attrgetter, do more (see 
+        PREFIX_CHECK_MIN_PASSES): they first extract the key of the leading 
+        run of records in order, once per record. Input that is already in 
+        order is left alone, and input that is in order except for a short 
+        tail (for example after a few appends) only has the tail sorted, then 
+        located in the prefix's keys by bisection and spliced in. 
+        sort_path_info reports how often each path is taken.
+        """
+        
+        if sort_hooks:
+            self.profiled_sort_list(records)
+            return
+        
+        if not self._checks_prefix:
+            self._sort_full(records)
+            return
+        # End unchecked
+        
+        size = len(records)
+        prefix, keys = self._prefix_keys(records)
+        
+        if prefix == size:
+            _count_sort_path('presorted')
+        elif (size - prefix) * TAIL_MERGE_RATIO <= size:
+            _count_sort_path('tail_merge')
+            self._merge_tail(records, prefix, keys)
+        else:
+            _count_sort_path('full')
+            self._sort_full(records)
+    # End sort_list
+    
+    def profiled_sort_list(self, records, function='sort_list', parseSeconds=0.0):
+        """    sort_list with each phase timed. The SortProfile is sent to the 
+        registered sort hooks and returned.
+        """
+        
+        start = perf_counter()
+        size = len(records)
+        profile = SortProfile(function, size, len(self.keys), self.strategy)
+        profile.parse_seconds = parseSeconds
+        
+        checked = self._checks_prefix
+        prefix, keys = self._prefix_keys(records) if checked else (0, None)
+        profile.check_seconds = perf_counter() - start
+        if keys is not None:
+            profile.key_calls = len(keys)
+        
+        if checked and prefix == size:
+            profile.path = 'presorted'
+            _count_sort_path('presorted')
+        elif checked and (size - prefix) * TAIL_MERGE_RATIO <= size:
+            profile.path = 'tail_merge'
+            _count_sort_path('tail_merge')
+            t = perf_counter()
+            self._merge_tail(records, prefix, keys)
+            profile.pass_seconds.append(perf_counter() - t)
+            profile.key_calls += (size - prefix) * (len(self.passes) + 1)
+        else:
+            if checked:
+                _count_sort_path('full')
+            t = perf_counter()
+            if self.transformed:
+                order = self._transformed_order(records)
+            else:
+                order = self._columnar_order(records)
+            if order is not None:
+                profile.path = 'full' if self.transformed else 'columnar'
+                records[:] = [records[i] for i in order]
+                profile.pass_seconds.append(perf_counter() - t)
+                profile.key_calls += size * len(self.keys)
+            elif not self.keys:
+                profile.path = 'full'
+                records.sort()
+                profile.pass_seconds.append(perf_counter() - t)
+            else:
+                profile.path = 'full'
+                indexes = range(size)
+                for keyfunc, r in self.passes:
+                    t = perf_counter()
+                    column = list(map(keyfunc, records))
+                    t2 = perf_counter()
+                    order = sorted(indexes, key=column.__getitem__, reverse=r)
+                    records[:] = [records[i] for i in order]
+                    profile.extract_seconds += t2 - t
+                    profile.pass_seconds.append(perf_counter() - t2)
+                    profile.key_calls += size
+                # End for
+        # End paths
+        
+        profile.total_seconds = perf_counter() - start + parseSeconds
+        emit_sort_profile(profile)
+        
+        return profile
+    # End profiled_sort_list
+    
+    def _prefix_keys(self, records):
+        """    Return (prefix, keys): the length of the leading run of the list 
+        records that is in plan order, and the keyfunc values of at least 
+        its records. Keys are extracted in doubling chunks, so input out of 
+        order early on costs few key calls.
+        """
+        
+        size = len(records)
+        keyfunc = self.keyfunc
+        keys = []
+        start = 0
+        step = PREFIX_CHUNK
+        
+        while start < size:
+            end = min(start + step, size)
+            chunk = list(map(keyfunc, records[start:end]))
+            
+            # Compare from the last key of the previous chunk on
+            current = chain(keys[-1:], chunk)
+            following = islice(chunk, 0 if keys else 1, None)
+            if self.reverse:
+                inversions = map(lt, current, following)
+            else:
+                inversions = map(lt, following, current)
+            
+            found = next(compress(count(max(start, 1)), inversions), None)
+            keys += chunk
+            if found is not None:
+                return found, keys
+            
+            start = end
+            step *= 2
+        # End while
+        
+        return size, keys
+    # End _prefix_keys
+    
+    def _merge_tail(self, records, prefix, keys):
+        """    Sort the tail records[prefix:] and splice it into the sorted 
+        records[:prefix], whose keys start the list keys. Each tail record 
+        is located by bisection in the keys (after the equal records of the 
+        prefix, as a stable sort would) and the result is built from slices, 
+        so the merge is linear in pointer copies and needs no key calls on 
+        the prefix.
+        """
+        
+        tail = records[prefix:]
+        self._sort_full(tail)
+        tailKeys = map(self.keyfunc, tail)
+        
+        if self.reverse:
+            # Records at or before k in descending order are those whose 
+            # keys are not less than k
+            ascending = keys[prefix - 1::-1] if prefix else []
+            positions = [prefix - bisect_left(ascending, k) for k in tailKeys]
+        else:
+            positions = [bisect_right(keys, k, 0, prefix) for k in tailKeys]
+        # End positions
+        
+        res = []
+        last = 0
+        for record, position in zip(tail, positions):
+            res.extend(records[last:position])
+            res.append(record)
+            last = position
+        # End for
+        res.extend(records[last:prefix])
+        
+        records[:] = res
+    # End _merge_tail
+    
+    def _sort_full(self, records):
+        if self.transformed:
+            records[:] = [records[i] for i in self._transformed_order(records)]
+            return
+        # End transformed
+        
+        order = self._columnar_order(records) if len(records) >= columnar.NUMPY_MIN_SIZE else None
+        if order is not None:
+            records[:] = [records[i] for i in order]
+        elif not self.keys:
+            records.sort()
+        else:
+            for keyfunc, r in self.passes:
+                records.sort(key=keyfunc, reverse=r)
+            # End for
+    # End _sort_full
+    
+    def _columnar_order(self, records):
+        """    The NumPy lexsort permutation when the backend is selected for 
+        records (see columnar.selected), or None when the pure Python path 
+        should be used.
+        """
+        
+        if not columnar.selected(self, len(records)):
+            return None
+        
+        return columnar.lexsort_order(self, records, columnar.RANKED_MIN_REPEAT)
+    # End _columnar_order
+    
+    def _transformed_order(self, records):
+        """    The index order of records with every key column extracted (and 
+        transformed) exactly once.
+        """
+        
+        columns = [list(map(g, records)) for g in self.getters]
+        if columnar.selected(self, len(records)):
+            order = columnar.lexsort_columns(self, columns, columnar.RANKED_MIN_REPEAT)
+            if order is not None:
+                return order
+        # End columnar
+        
+        order = list(range(len(records)))
+        for column, (k, r) in reversed(list(zip(columns, self.keys))):
+            order.sort(key=column.__getitem__, reverse=r)
+        # End for
+        
+        return order
+    # End _transformed_order
     
+    def order(self, records):
+        """    Return a list of the indexes of the sequence records in plan order, 
+        leaving records untouched.
+        """
+        
+        indexes = range(len(records))
+        
+        if self.transformed:
+            return self._transformed_order(records)
+        
+        res = self._columnar_order(records)
+        if res is not None:
+            return res
+        elif not self.keys:
+            return sorted(indexes, key=records.__getitem__)
+        
+        res = list(indexes)
+        for keyfunc, r in self.passes:
+            column = list(map(keyfunc, records))
+            res.sort(key=column.__getitem__, reverse=r)
+        # End for
+        
+        return res
+    # End order
+# End class SortPlan
+
+
+def plan_sort(getter, *keys):
+    """    plan_sort(getter, *keys) -> SortPlan
+    
+    Resolve the keyspecs and choose the sort strategy that complex_sorted 
+    would use for them. The strategy is reported by the 'strategy' attribute.
+    
+    Ex:
+        plan_sort(itemgetter, 'age desc', 'name').strategy -> 'multipass'
+    
+    This always builds a new plan. Use compile_keys to share cached plans.
+    """
+    
+    resolved = list(ResolveKeys(flatten_all(keys)))
+    resolved.reverse()
+    
+    return SortPlan(getter, resolved)
+# End plan_sort
+
+
+PlanCacheInfo = namedtuple('PlanCacheInfo', 'hits misses maxsize currsize')
+
+
+class _PlanCache(object):
+    """    A bounded, thread-safe LRU mapping of (getter, keys) to SortPlan.
+    """
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = Lock()
+    
+    def get(self, getter, keys):
+        # Key types are part of the cache key as 1, 1.0 and True hash alike
+        try:
+            cacheKey = (getter, keys, tuple(map(type, keys)))
+            hash(cacheKey)
+        except TypeError:
+            keys = tuple(flatten_all(keys))
+            cacheKey = (getter, keys, tuple(map(type, keys)))
+        
+        # Hits take no lock: the lookup and _move_to_end are each atomic, and 
+        # a plan evicted by another thread meanwhile is still valid
+        plan = self._plans.get(cacheKey)
+        if plan is not None:
+            self.hits += 1
+            try:
+                _move_to_end(self._plans, cacheKey)
+            except KeyError:
+                pass
+            return plan
+        # End hit
+        
+        with self._lock:
+            self.misses += 1
+        
+        plan = plan_sort(getter, *keys)
+        
+        with self._lock:
+            if self.maxsize > 0:
+                self._plans[cacheKey] = plan
+                while len(self._plans) > self.maxsize:
+                    self._plans.popitem(last=False)
+        # End with
+        
+        return plan
+    # End get
+    
+    def info(self):
+        with self._lock:
+            return PlanCacheInfo(self.hits, self.misses, self.maxsize, len(self._plans))
+    
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._plans) > max(maxsize, 0):
+                self._plans.popitem(last=False)
+# End class _PlanCache
+
+
+_plan_cache = _PlanCache(256)
+
+
+def compile_keys(getter, *keys):
+    """    compile_keys(getter, *keys) -> SortPlan
+    
+    Return a reusable, hashable SortPlan for the getter and keyspecs with 
+    its getters already built. Plans are kept in a bounded LRU cache, so 
+    repeated keyspecs are not parsed again. complex_sorted, isorted, asorted 
+    and msort all go through this cache.
+    
+    Ex:
+        byAgeName = compile_keys(itemgetter, 'age desc', 'name')
+        byAgeName.sort(data)
+    """
+    
+    return _plan_cache.get(getter, keys)
+# End compile_keys
+
+
+def plan_cache_info():
+    """    plan_cache_info() -> PlanCacheInfo(hits, misses, maxsize, currsize)
+    """
+    
+    return _plan_cache.info()
+# End plan_cache_info
+
+
+def plan_cache_clear():
+    """    Empty the compile_keys cache and reset its statistics.
+    """
+    
+    _plan_cache.clear()
+# End plan_cache_clear
+
+
+def set_plan_cache_size(maxsize):
+    """    Set the maximum number of plans kept by compile_keys. 
+    A maxsize of 0 disables caching.
+    """
+    
+    _plan_cache.resize(maxsize)
+# End set_plan_cache_size
+
 
 def complex_sorted(iterable, getter, *keys):
     """    complex_sorted(iterable, getter, *keys) -> new sorted list
@@ -124,19 +1029,15 @@ def complex_sorted(iterable, getter, *keys):
     and return a new list of the dictionaries sorted by the keys and directionals.
     """
     
-    if keys:
-        keys = flatten_all(keys)
-        res = None
-        for k, r in ResolveKeys(keys):
-            if res is None:
-                res = sorted(iterable, key=getter(k), reverse=r)
-            else:
-                res.sort(key=getter(k), reverse=r)
-        # End for
-    else:
-        res = sorted(iterable)
+    if sort_hooks:
+        start = perf_counter()
+        plan = compile_keys(getter, *keys)
+        res = list(iterable)
+        plan.profiled_sort_list(res, 'complex_sorted', perf_counter() - start)
+        return res
+    # End profiled
     
-    return res
+    return compile_keys(getter, *keys).sort(iterable)
 # End complex_sorted
 
 
@@ -177,6 +1078,10 @@ def isorted(iterable, *keys):
     Given all of the above, the call to isorted would be like this:
         isorted(data, 'age desc', 'name')
     and return a new list of the dictionaries sorted by the keys and directionals.
+    
+    Keys of nested data are written as dotted paths, with digits indexing 
+    lists and a backslash escaping a literal dot (see split_path):
+        isorted(orders, '-customer.address.city', 'items.0.price', 'a\\.b')
     """
     
     from operator import itemgetter
@@ -237,12 +1142,75 @@ def asorted(iterable, *keys):
 
 
 
+def _instance_getter(self):
+    """    Validate and return the 'getter' attribute used by msort, defaulting 
+    it to operator.itemgetter when it is missing or None.
+    """
+    
+    if getattr(self, 'getter', None) is None:
+        self.getter = _itemgetter
+    # End set attribute if not defined
+    
+    if (self.getter.__class__.__name__ != 'type') or \
+       (self.getter.__name__ not in ('itemgetter', 'attrgetter')):
+        raise ValueError("You must supply an itemgetter or an attrgetter")
+    # End getter check 
+    
+    return self.getter
+# End _instance_getter
+
+
+# Per class plans for msort: {class: {(getter, keys): SortPlan}}. Getters are 
+# validated once, when their plan is first compiled.
+_class_plans = WeakKeyDictionary()
+
+# Plans kept per class before its cache is emptied
+CLASS_PLAN_LIMIT = 64
+
+
+def _instance_plan(self, keys):
+    """    Return the SortPlan for an msort call, cached on the class of self.
+    """
+    
+    getter = getattr(self, 'getter', None)
+    plans = _class_plans.get(type(self))
+    if plans is None:
+        plans = _class_plans.setdefault(type(self), {})
+    
+    try:
+        return plans[(getter, keys)]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable keys
+        return compile_keys(_instance_getter(self), *keys)
+    
+    plan = compile_keys(_instance_getter(self), *keys)
+    if len(plans) >= CLASS_PLAN_LIMIT:
+        plans.clear()
+    plans[(getter, keys)] = plan
+    
+    return plan
+# End _instance_plan
+
+
+# Mutable sequences that msort reorders by following the permutation's 
+# cycles: indexing them is constant time, unlike a deque's
+_INDEXED_SEQUENCES = (array, UserList)
+
+
 def msort(self, *keys):
     """    If you subclass from a iterable base class, you can add this method 
     to an instance or to the class.
     If you subclass from list, it will act like list.sort() except it will return
     a reference to the instance.
-    If you do not subclass from list, it will return a new sorted list.
+    Any other MutableSequence (deque, array.array, UserList, ...) is also 
+    reordered in place. An array.array or UserList, which index in constant 
+    time, gets the sort permutation applied by following its cycles (see 
+    apply_permutation_in_place), so no second copy of the data is made. 
+    Other sequences, such as a deque, are copied to a list, sorted and 
+    refilled with clear() and extend().
+    If you do not subclass from a MutableSequence, it will return a new sorted list.
     
     You will have to set a class or instance attribute named 'getter' to either
     operator.itemgetter or operator.attrgetter depending on the data being sorted.
@@ -291,32 +1259,256 @@ def msort(self, *keys):
     and return a new list of the dictionaries sorted by the keys and directionals.
     """
     
-    if not hasattr(self, 'getter'):
-        from operator import itemgetter
-        
-        self.getter = itemgetter
-    # End set attribute if not defined
-    
-    if (self.getter.__class__.__name__ != 'type') or \
-       (self.getter.__name__ not in ('itemgetter', 'attrgetter')):
-        if self.getter is None:
-            self.getter = itemgetter
-        else:
-            raise ValueError("You must supply an itemgetter or an attrgetter")
-    # End getter check 
-    
     if isinstance(self, list):
-        if keys:
-            keys = flatten_all(keys)
-            for k, r in ResolveKeys(keys):
-                self.sort(key=self.getter(k), reverse=r)
-            # End for
+        if sort_hooks:
+            start = perf_counter()
+            plan = _instance_plan(self, keys)
+            plan.profiled_sort_list(self, 'msort', perf_counter() - start)
         else:
-            self.sort()
+            _instance_plan(self, keys).sort_list(self)
         
+        return self
+    elif isinstance(self, _INDEXED_SEQUENCES):
+        apply_permutation_in_place(_instance_plan(self, keys).order(self), self)
+        return self
+    elif isinstance(self, (MutableSequence, deque)):
+        records = list(self)
+        _instance_plan(self, keys).sort_list(records)
+        self.clear()
+        self.extend(records)
         return self
     else:
-        return complex_sorted(self, self.getter, *keys)
-# End msort    
+        return _instance_plan(self, keys).sort(self)
+# End msort
+
+
+def _index_array(indexes, size):
+    """    Pack indexes into the most compact signed array that holds size.
+    """
+    
+    typecode = 'l' if size <= 2 ** (array('l').itemsize * 8 - 1) else 'q'
+    
+    return array(typecode, indexes)
+# End _index_array
+
+
+def complex_argsort(iterable, getter, *keys):
+    """    complex_argsort(iterable, getter, *keys) -> array of indexes
+    
+    Return the permutation that complex_sorted(iterable, getter, *keys) 
+    would apply, as an array('l') of indexes into iterable, without copying 
+    or reordering the records. Ties keep their original order.
+    
+    Ex:
+        order = complex_argsort(data, itemgetter, 'age desc', 'name')
+        [data[i] for i in order] == complex_sorted(data, itemgetter, 'age desc', 'name')
+    """
+    
+    if not isinstance(iterable, Sequence):
+        iterable = list(iterable)
+    
+    return _index_array(compile_keys(getter, *keys).order(iterable), len(iterable))
+# End complex_argsort
+
+
+def iargsort(iterable, *keys):
+    """    iargsort(iterable, *keys) -> array of indexes
+    
+    complex_argsort using operator.itemgetter.
+    """
+    
+    return complex_argsort(iterable, _itemgetter, *keys)
+# End iargsort
+
+
+def aargsort(iterable, *keys):
+    """    aargsort(iterable, *keys) -> array of indexes
+    
+    complex_argsort using operator.attrgetter.
+    """
+    
+    return complex_argsort(iterable, _attrgetter, *keys)
+# End aargsort
+
+
+def apply_permutation(order, *sequences):
+    """    apply_permutation(order, *sequences) -> tuple of new lists
+    
+    Reorder any number of parallel sequences by the index permutation order 
+    (as returned by iargsort or aargsort) in a single pass over order.
+    
+    Ex:
+        names, ages = apply_permutation(iargsort(rows, '-age'), names, ages)
+    """
+    
+    res = tuple([] for s in sequences)
+    appends = [(r.append, s) for r, s in zip(res, sequences)]
+    
+    for i in order:
+        for append, s in appends:
+            append(s[i])
+    # End for
+    
+    return res
+# End apply_permutation
+
+
+def apply_permutation_in_place(order, *sequences):
+    """    apply_permutation_in_place(order, *sequences) -> None
+    
+    Reorder mutable sequences in place so that sequence[i] becomes the old 
+    sequence[order[i]], by following the cycles of the permutation. Only 
+    one record per sequence is held aside at a time, plus one byte per 
+    index to mark the cycles already done. Every sequence is indexed about 
+    twice per record, so this is linear only for sequences with constant 
+    time indexing (list, array.array, UserList), not for a deque.
+    
+    Ex:
+        apply_permutation_in_place(iargsort(rows, '-age'), rows, names)
+    """
+    
+    size = len(order)
+    done = bytearray(size)
+    
+    for start in range(size):
+        if done[start]:
+            continue
+        
+        j = start
+        while not done[j]:
+            done[j] = 1
+            j = order[j]
+        # End mark cycle
+        
+        if order[start] == start:
+            continue
+        
+        for s in sequences:
+            held = s[start]
+            j = start
+            k = order[j]
+            while k != start:
+                s[j] = s[k]
+                j = k
+                k = order[j]
+            # End while
+            s[j] = held
+        # End for
+    # End for
+# End apply_permutation_in_place
+
+
+def complex_topk(iterable, n, getter, *keys):
+    """    complex_topk(iterable, n, getter, *keys) -> new list of at most n records
+    
+    Return the first n records that complex_sorted(iterable, getter, *keys) 
+    would return, without sorting the whole iterable. A bounded heap is used, 
+    so ties keep their original order and the result always equals 
+    complex_sorted(iterable, getter, *keys)[:n]. A negative n raises 
+    ValueError.
+    """
+    
+    return compile_keys(getter, *keys).smallest(n, iterable)
+# End complex_topk
+
+
+def isorted_topk(iterable, n, *keys):
+    """    isorted_topk(iterable, n, *keys) -> new list of at most n records
+    
+    Same as isorted(iterable, *keys)[:n] using operator.itemgetter, but 
+    without sorting the whole iterable.
+    
+    Ex:
+        isorted_topk(data, 2, 'age desc', 'name')
+    """
+    
+    return complex_topk(iterable, n, _itemgetter, *keys)
+# End isorted_topk
+
+
+def asorted_topk(iterable, n, *keys):
+    """    asorted_topk(iterable, n, *keys) -> new list of at most n records
+    
+    Same as asorted(iterable, *keys)[:n] using operator.attrgetter, but 
+    without sorting the whole iterable.
+    """
+    
+    return complex_topk(iterable, n, _attrgetter, *keys)
+# End asorted_topk
+
+
+def msort_topk(self, n, *keys):
+    """    The top-k counterpart of msort. Bind it to a class or instance like 
+    msort; it uses the same 'getter' attribute and returns a new list of the 
+    first n records in keyspec order. The instance is never changed.
+    
+    Ex:
+        self.msort_topk(10, 'age desc', 'name')
+    """
+    
+    return _instance_plan(self, keys).smallest(n, self)
+# End msort_topk
+
+
+def complex_window(iterable, offset, limit, getter, *keys, **options):
+    """    complex_window(iterable, offset, limit, getter, *keys, after=None) -> new list
+    
+    Return one page of complex_sorted(iterable, getter, *keys): the records 
+    at positions offset to offset + limit, without sorting the whole 
+    iterable. Only offset + limit records are kept in a bounded heap.
+    
+    For keyset pagination pass the last record of the previous page as 
+    after: only the records that follow it in keyspec order are considered, 
+    so deep pages cost no more than the first one (offset is then counted 
+    from after, usually 0).
+    
+    Ex:
+        page = complex_window(rows, 0, 50, itemgetter, '-score', 'id')
+        page = complex_window(rows, 0, 50, itemgetter, '-score', 'id', after=page[-1])
+    """
+    
+    after = options.pop('after', None)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    
+    plan = compile_keys(getter, *keys)
+    if after is not None:
+        iterable = plan.following(iterable, after)
+    
+    return plan.window(offset, limit, iterable)
+# End complex_window
+
+
+def isorted_window(iterable, offset, limit, *keys, **options):
+    """    isorted_window(iterable, offset, limit, *keys, after=None) -> new list
+    
+    Same as isorted(iterable, *keys)[offset:offset + limit] using 
+    operator.itemgetter, but without sorting the whole iterable. See 
+    complex_window for the after cursor.
+    
+    Ex:
+        isorted_window(data, 20, 10, 'age desc', 'name')
+    """
+    
+    return complex_window(iterable, offset, limit, _itemgetter, *keys, **options)
+# End isorted_window
+
+
+def asorted_window(iterable, offset, limit, *keys, **options):
+    """    asorted_window(iterable, offset, limit, *keys, after=None) -> new list
+    
+    Same as asorted(iterable, *keys)[offset:offset + limit] using 
+    operator.attrgetter, but without sorting the whole iterable.
+    """
+    
+    return complex_window(iterable, offset, limit, _attrgetter, *keys, **options)
+# End asorted_window
 
 
+from multi_key_sort.external import external_sorted, iexternal_sorted, aexternal_sorted, imerge
+from multi_key_sort.collection import SortedCollection
+from multi_key_sort.table import SortableTable
+from multi_key_sort.memo import SortResultCache
+from multi_key_sort.binary import struct_argsort, sort_struct_file
+from multi_key_sort.grouping import grouped_sorted, distinct_on
+from multi_key_sort.compact import compact_sorted, compact_argsort
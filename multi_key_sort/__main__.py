@@ -0,0 +1,6 @@
+import sys
+
+from multi_key_sort.cli import main
+
+
+sys.exit(main())
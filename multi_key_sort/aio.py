@@ -0,0 +1,268 @@
+"""    Module: multi_key_sort.aio
+    asyncio entry points for multiple-key, multiple-direction stable sorts.
+    
+    The input may be an async iterable or an ordinary iterable. It is 
+    collected chunk_size records at a time, handing control back to the 
+    event loop between chunks. The sort itself either runs cooperatively 
+    (chunks are sorted one at a time and merged in batches, with the loop 
+    getting control after each step) or, when an executor is given, in that 
+    executor.
+    
+    list.sort holds the GIL for the whole sort, so a thread pool executor 
+    does not keep the loop responsive in CPython; use the cooperative 
+    default or a process pool.
+    
+    This module needs Python 3.7 or later and is not imported by 
+    multi_key_sort itself, which keeps supporting older Pythons.
+    
+    Ex:
+        from multi_key_sort.aio import isorted_async, isorted_topk_async, imerge_async
+        
+        rows = await isorted_async(cursor, 'age desc', 'name') 
+        first = await isorted_topk_async(cursor, 50, '-score') 
+        async for row in imerge_async(shardA, shardB, keys=('-score', 'id')):
+            ...
+"""
+
+import asyncio
+import heapq
+from functools import partial
+from itertools import islice
+from operator import itemgetter, attrgetter
+
+from multi_key_sort import compile_keys, complex_sorted
+from multi_key_sort.external import merge_plan
+
+
+# Records handled between two returns to the event loop
+DEFAULT_CHUNK_SIZE = 20000
+
+
+async def _chunks(iterable, size):
+    """    Yield lists of at most size records from an async or ordinary 
+    iterable, returning control to the event loop after each one.
+    """
+    
+    if hasattr(iterable, '__aiter__'):
+        chunk = []
+        async for record in iterable:
+            chunk.append(record)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+                await asyncio.sleep(0)
+        # End for
+        if chunk:
+            yield chunk
+        return
+    # End async iterable
+    
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
+        await asyncio.sleep(0)
+    # End while
+# End _chunks
+
+
+async def _sort_cooperative(plan, records, size):
+    """    Sort records in runs of size records and merge the runs in batches 
+    of size records, yielding to the event loop between steps.
+    """
+    
+    if len(records) <= size:
+        plan.sort_list(records)
+        return records
+    # End single run
+    
+    runs = []
+    for start in range(0, len(records), size):
+        run = records[start:start + size]
+        plan.sort_list(run)
+        runs.append(run)
+        await asyncio.sleep(0)
+    # End for
+    del records
+    
+    res = []
+    merged = merge_plan(plan, *runs)
+    while True:
+        batch = list(islice(merged, size))
+        if not batch:
+            break
+        res.extend(batch)
+        await asyncio.sleep(0)
+    # End while
+    
+    return res
+# End _sort_cooperative
+
+
+def _chunk_size(options):
+    size = options.pop('chunk_size', DEFAULT_CHUNK_SIZE)
+    if size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    
+    return size
+# End _chunk_size
+
+
+async def complex_sorted_async(iterable, getter, *keys, **options):
+    """    await complex_sorted_async(iterable, getter, *keys, **options) -> new sorted list
+    
+    Same result as complex_sorted(iterable, getter, *keys) for an async or 
+    ordinary iterable, without blocking the event loop for more than about 
+    chunk_size records of work at a time.
+    
+    Options:
+        chunk_size  - records collected, sorted or merged per step
+                      (default 20000)
+        executor    - a concurrent.futures.Executor to run the sort in
+                      instead of sorting cooperatively; for a process pool 
+                      the records, getter and keys must be picklable
+    """
+    
+    size = _chunk_size(options)
+    executor = options.pop('executor', None)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    
+    plan = compile_keys(getter, *keys)
+    records = []
+    async for chunk in _chunks(iterable, size):
+        records.extend(chunk)
+    
+    if executor is not None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(complex_sorted, records, getter, *keys))
+    # End executor
+    
+    return await _sort_cooperative(plan, records, size)
+# End complex_sorted_async
+
+
+async def isorted_async(iterable, *keys, **options):
+    """    await isorted_async(iterable, *keys, **options) -> new sorted list
+    
+    complex_sorted_async using operator.itemgetter.
+    """
+    
+    return await complex_sorted_async(iterable, itemgetter, *keys, **options)
+# End isorted_async
+
+
+async def asorted_async(iterable, *keys, **options):
+    """    await asorted_async(iterable, *keys, **options) -> new sorted list
+    
+    complex_sorted_async using operator.attrgetter.
+    """
+    
+    return await complex_sorted_async(iterable, attrgetter, *keys, **options)
+# End asorted_async
+
+
+async def complex_topk_async(iterable, n, getter, *keys, **options):
+    """    await complex_topk_async(iterable, n, getter, *keys, chunk_size=20000) -> new list
+    
+    Same result as complex_topk(iterable, n, getter, *keys). Records are 
+    consumed chunk by chunk and only the best n seen so far are kept, so 
+    memory stays bounded by n plus one chunk.
+    """
+    
+    size = _chunk_size(options)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    
+    if n < 0:
+        raise ValueError("n must not be negative")
+    
+    plan = compile_keys(getter, *keys)
+    best = []
+    async for chunk in _chunks(iterable, size):
+        if n > 0:
+            # The kept records precede the chunk, so ties stay stable
+            best = plan.smallest(n, best + chunk)
+    # End for
+    
+    return best
+# End complex_topk_async
+
+
+async def isorted_topk_async(iterable, n, *keys, **options):
+    """    await isorted_topk_async(iterable, n, *keys, chunk_size=20000) -> new list
+    
+    complex_topk_async using operator.itemgetter.
+    """
+    
+    return await complex_topk_async(iterable, n, itemgetter, *keys, **options)
+# End isorted_topk_async
+
+
+async def asorted_topk_async(iterable, n, *keys, **options):
+    """    await asorted_topk_async(iterable, n, *keys, chunk_size=20000) -> new list
+    
+    complex_topk_async using operator.attrgetter.
+    """
+    
+    return await complex_topk_async(iterable, n, attrgetter, *keys, **options)
+# End asorted_topk_async
+
+
+async def imerge_async(*iterables, **options):
+    """    imerge_async(*iterables, keys=(), getter=operator.itemgetter) -> async generator
+    
+    Lazily merge async or ordinary iterables that are each already sorted 
+    by the keyspecs. Records that compare equal come from the earlier 
+    iterable first, as with imerge.
+    
+    Ex:
+        async for row in imerge_async(shardA, shardB, keys=('-score', 'id')):
+            ...
+    """
+    
+    keys = options.pop('keys', ())
+    getter = options.pop('getter', itemgetter)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    if isinstance(keys, str):
+        keys = (keys,)
+    
+    key = compile_keys(getter, *keys).record_key
+    
+    async def next_record(iterator):
+        if hasattr(iterator, '__anext__'):
+            return await iterator.__anext__()
+        
+        try:
+            return next(iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+    # End next_record
+    
+    # (key, iterable position, record, iterator); the position is unique
+    # among the entries, so records are never compared
+    heap = []
+    for i, iterable in enumerate(iterables):
+        iterator = iterable.__aiter__() if hasattr(iterable, '__aiter__') else iter(iterable)
+        try:
+            record = await next_record(iterator)
+        except StopAsyncIteration:
+            continue
+        heap.append((key(record), i, record, iterator))
+    # End for
+    heapq.heapify(heap)
+    
+    while heap:
+        k, i, record, iterator = heap[0]
+        yield record
+        try:
+            record = await next_record(iterator)
+        except StopAsyncIteration:
+            heapq.heappop(heap)
+            continue
+        heapq.heapreplace(heap, (key(record), i, record, iterator))
+    # End while
+# End imerge_async
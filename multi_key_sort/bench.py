@@ -0,0 +1,320 @@
+"""    Module: multi_key_sort.bench
+    Benchmarks for complex_sorted, isorted, asorted, msort and compact_sorted.
+    
+    Run with:
+        python -m multi_key_sort.bench [options]
+    
+    Every combination of record type, size, key count, direction pattern 
+    and input order (--orders) is timed for each applicable sort function. Throughput (records per
+    second) and peak traced memory are reported, and the results can be
+    written as JSON and compared against an earlier run:
+        
+        python -m multi_key_sort.bench --json before.json
+        ... change the code ...
+        python -m multi_key_sort.bench --json after.json --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from operator import itemgetter, attrgetter
+
+import multi_key_sort as mks
+
+
+FIELDS = ('f0', 'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7')
+
+RECORD_TYPES = ('dict', 'tuple', 'namedtuple', 'slots', 'object')
+FUNCTIONS = ('complex_sorted', 'isorted', 'asorted', 'msort', 'compact_sorted')
+DIRECTIONS = ('asc', 'desc', 'mixed')
+ORDERS = ('random', 'presorted', 'tail')
+
+# Share of the records appended unsorted after a sorted prefix for 'tail'
+TAIL_FRACTION = 0.01
+
+NamedRecord = namedtuple('NamedRecord', FIELDS)
+
+
+class SlotsRecord(object):
+    __slots__ = FIELDS
+    
+    def __init__(self, *values):
+        for name, value in zip(FIELDS, values):
+            setattr(self, name, value)
+# End class SlotsRecord
+
+
+class PlainRecord(object):
+    def __init__(self, *values):
+        for name, value in zip(FIELDS, values):
+            setattr(self, name, value)
+# End class PlainRecord
+
+
+class MsortList(list):
+    msort = mks.msort
+# End class MsortList
+
+
+def make_values(size, seed=0):
+    """    Return size rows of 8 field values with a mix of types and
+    cardinalities: low-cardinality strings, small and large ints, floats
+    and high-cardinality strings.
+    """
+    
+    rnd = random.Random(seed)
+    regions = ['north', 'south', 'east', 'west']
+    
+    return [(rnd.choice('MF'),
+             rnd.randint(18, 90),
+             rnd.choice(regions),
+             rnd.random(),
+             rnd.randint(0, 10 ** 9),
+             'name{0:07d}'.format(rnd.randint(0, size)),
+             rnd.randint(0, 9),
+             rnd.uniform(-1e6, 1e6)) for i in range(size)]
+# End make_values
+
+
+def make_records(recordType, values):
+    if recordType == 'dict':
+        return [dict(zip(FIELDS, v)) for v in values]
+    elif recordType == 'tuple':
+        return list(values)
+    elif recordType == 'namedtuple':
+        return [NamedRecord(*v) for v in values]
+    elif recordType == 'slots':
+        return [SlotsRecord(*v) for v in values]
+    
+    return [PlainRecord(*v) for v in values]
+# End make_records
+
+
+def make_keys(recordType, keyCount, direction):
+    """    Return keyspecs for the first keyCount fields. 'mixed' alternates
+    ascending and descending keys starting with descending.
+    """
+    
+    names = [str(i) for i in range(keyCount)] if recordType == 'tuple' else list(FIELDS[:keyCount])
+    
+    if direction == 'desc':
+        return ['-' + n for n in names]
+    elif direction == 'mixed':
+        return [('-' + n) if i % 2 == 0 else n for i, n in enumerate(names)]
+    
+    return names
+# End make_keys
+
+
+def order_records(order, records, recordType, keys):
+    """    Arrange records for an input order: 'random' keeps them as made, 
+    'presorted' sorts them by keys and 'tail' sorts all but the last 
+    TAIL_FRACTION of them, which are appended as made (a sorted list after 
+    a batch of appends).
+    """
+    
+    if order == 'random':
+        return records
+    
+    tail = int(len(records) * TAIL_FRACTION) if order == 'tail' else 0
+    prefix = mks.complex_sorted(records[:len(records) - tail], getter_for(recordType), *keys)
+    
+    return prefix + records[len(records) - tail:]
+# End order_records
+
+
+def getter_for(recordType):
+    return itemgetter if recordType in ('dict', 'tuple') else attrgetter
+# End getter_for
+
+
+def make_call(function, recordType, records, keys):
+    """    Return a callable running one sort, or None when function does not
+    apply to recordType.
+    """
+    
+    getter = getter_for(recordType)
+    
+    if function == 'complex_sorted':
+        return lambda: mks.complex_sorted(records, getter, *keys)
+    elif function == 'isorted':
+        return (lambda: mks.isorted(records, *keys)) if getter is itemgetter else None
+    elif function == 'asorted':
+        return (lambda: mks.asorted(records, *keys)) if getter is attrgetter else None
+    elif function == 'compact_sorted':
+        return lambda: mks.compact_sorted(records, getter, *keys)
+    
+    def run():
+        data = MsortList(records)
+        data.getter = getter
+        return data.msort(*keys)
+    
+    return run
+# End make_call
+
+
+def time_call(call, repeat):
+    best = None
+    for i in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # End for
+    
+    return best
+# End time_call
+
+
+def peak_memory(call):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+# End peak_memory
+
+
+def run(sizes, recordTypes, keyCounts, directions, functions, repeat=3, memory=True, out=sys.stdout, orders=('random',)):
+    """    Run the benchmark matrix and return a list of result dicts.
+    """
+    
+    results = []
+    
+    for size in sizes:
+        values = make_values(size)
+        for recordType in recordTypes:
+            records = make_records(recordType, values)
+            for keyCount in keyCounts:
+                for direction in directions:
+                    keys = make_keys(recordType, keyCount, direction)
+                    for order in orders:
+                        ordered = order_records(order, records, recordType, keys)
+                        for function in functions:
+                            call = make_call(function, recordType, ordered, keys)
+                            if call is None:
+                                continue
+                            
+                            seconds = time_call(call, repeat)
+                            result = {
+                                'function': function,
+                                'record_type': recordType,
+                                'size': size,
+                                'keys': keyCount,
+                                'direction': direction,
+                                'order': order,
+                                'strategy': 'compact' if function == 'compact_sorted' else 
+                                            mks.compile_keys(getter_for(recordType), *keys).strategy,
+                                'seconds': seconds,
+                                'records_per_second': size / seconds if seconds else None,
+                                'peak_bytes': peak_memory(call) if memory else None,
+                            }
+                            results.append(result)
+                            
+                            if out is not None:
+                                out.write(format_result(result) + '\n')
+                                out.flush()
+                        # End for functions
+                    # End for orders
+        # End for record types
+    # End for sizes
+    
+    return results
+# End run
+
+
+def result_id(result):
+    return (result['function'], result['record_type'], result['size'], result['keys'], result['direction'], 
+            result.get('order', 'random'))
+# End result_id
+
+
+def format_result(result, baseline=None):
+    line = '{function:<15} {record_type:<10} {size:>9} keys={keys} {direction:<5} {order:<9} {strategy:<9} ' \
+           '{seconds:>10.4f}s {rate:>12.0f} rec/s'.format(rate=result['records_per_second'] or 0, **result)
+    
+    if result['peak_bytes'] is not None:
+        line += ' {0:>10.1f} MiB'.format(result['peak_bytes'] / 1048576.0)
+    if baseline is not None:
+        line += ' {0:>+7.1%}'.format(baseline['seconds'] / result['seconds'] - 1 if result['seconds'] else 0)
+    
+    return line
+# End format_result
+
+
+def _int_list(text):
+    return [int(float(x)) for x in text.split(',') if x]
+
+
+def _name_list(choices):
+    def parse(text):
+        names = [x for x in text.split(',') if x]
+        for name in names:
+            if name not in choices:
+                raise argparse.ArgumentTypeError("{0!r} is not one of {1}".format(name, ', '.join(choices)))
+        return names
+    
+    return parse
+# End _name_list
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m multi_key_sort.bench', description=__doc__.splitlines()[2].strip())
+    parser.add_argument('--sizes', type=_int_list, default=[1000, 10000, 100000],
+                        help='comma separated record counts, e.g. 1e3,1e5,1e7')
+    parser.add_argument('--types', type=_name_list(RECORD_TYPES), default=list(RECORD_TYPES))
+    parser.add_argument('--keys', type=_int_list, default=[1, 2, 4, 8], help='comma separated key counts (1-8)')
+    parser.add_argument('--directions', type=_name_list(DIRECTIONS), default=list(DIRECTIONS))
+    parser.add_argument('--functions', type=_name_list(FUNCTIONS), default=list(FUNCTIONS))
+    parser.add_argument('--orders', type=_name_list(ORDERS), default=['random'], 
+                        help='input orders: random, presorted or tail (sorted plus {0:.0%} appended)'.format(TAIL_FRACTION))
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case, the best is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory run')
+    parser.add_argument('--json', metavar='PATH', help='write the results to PATH as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='compare against the results in a JSON file')
+    args = parser.parse_args(argv)
+    
+    for keyCount in args.keys:
+        if not 1 <= keyCount <= len(FIELDS):
+            parser.error('key counts must be between 1 and {0}'.format(len(FIELDS)))
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict((result_id(r), r) for r in json.load(f)['results'])
+    
+    results = run(args.sizes, args.types, args.keys, args.directions, args.functions,
+                  repeat=args.repeat, memory=not args.no_memory, out=None if baseline else sys.stdout, 
+                  orders=args.orders)
+    
+    if baseline is not None:
+        for result in results:
+            print(format_result(result, baseline.get(result_id(result))))
+    
+    if args.json:
+        report = {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'numpy': mks.columnar.available(),
+            'results': results,
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    # End write JSON
+    
+    return 0
+# End main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
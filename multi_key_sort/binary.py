@@ -0,0 +1,219 @@
+"""    Module: multi_key_sort.binary
+    Multiple-key, multiple-direction stable sort of fixed-width binary records.
+    
+    Records are described by a struct format with standard sizes (it must
+    start with '<', '>', '!' or '=') and one name per field. Only the key
+    fields are unpacked, one column at a time, straight from the buffer or
+    memory-mapped file; records are never turned into Python objects and
+    the sorted output is written by copying record bytes.
+    
+    Ex:
+        fmt = '<q d 8s I'
+        names = ('ts', 'price', 'symbol', 'size')
+        order = struct_argsort('ticks.bin', fmt, names, 'symbol', '-ts')
+        sort_struct_file('ticks.bin', 'sorted.bin', fmt, names, 'symbol', '-ts')
+"""
+
+import mmap
+import os
+import re
+import struct
+import tempfile
+from operator import itemgetter
+
+from multi_key_sort import compile_keys, _index_array
+
+
+_FIELD = re.compile(r'\s*(\d*)([xcbB?hHiIlLqQnNefdsp])')
+
+
+class RecordLayout(object):
+    """    RecordLayout(fmt, names) -> field offsets of a fixed-width record
+    
+    'fields' maps each name (and its position) to (offset, struct code).
+    """
+    
+    def __init__(self, fmt, names):
+        if not fmt or fmt[0] not in '<>!=':
+            raise ValueError("The format must use standard sizes, starting with '<', '>', '!' or '='")
+        
+        self.fmt = fmt
+        self.order = fmt[0]
+        self.size = struct.calcsize(fmt)
+        self.names = tuple(names)
+        
+        codes = []
+        offset = 0
+        pos = 1
+        while pos < len(fmt):
+            m = _FIELD.match(fmt, pos)
+            if m is None:
+                if fmt[pos:].strip():
+                    raise ValueError("Unsupported format character in {0!r} at {1}".format(fmt, pos))
+                break
+            # End unmatched
+            
+            count = int(m.group(1)) if m.group(1) else 1
+            code = m.group(2)
+            if code == 'x':
+                offset += count
+            elif code in 'sp':
+                codes.append((offset, '{0}{1}'.format(count, code)))
+                offset += count
+            else:
+                width = struct.calcsize(self.order + code)
+                for i in range(count):
+                    codes.append((offset, code))
+                    offset += width
+            # End code
+            pos = m.end()
+        # End while
+        
+        if len(codes) != len(self.names):
+            raise ValueError("The format has {0} fields but {1} names were given".format(len(codes), len(self.names)))
+        
+        self.fields = {}
+        for i, (name, field) in enumerate(zip(self.names, codes)):
+            self.fields[name] = field
+            self.fields[i] = field
+        # End for
+    # End __init__
+    
+    def column(self, buffer, key, count, start=0):
+        """    Unpack the field key of count records that begin at byte start
+        of buffer into a list.
+        """
+        
+        try:
+            offset, code = self.fields[key]
+        except KeyError:
+            raise KeyError("Unknown field {0!r}".format(key))
+        
+        width = struct.calcsize(self.order + code)
+        fieldStruct = struct.Struct('{0}{1}x{2}{3}x'.format(self.order, offset, code, self.size - offset - width))
+        view = memoryview(buffer)[start:start + count * self.size]
+        try:
+            return list(map(itemgetter(0), fieldStruct.iter_unpack(view)))
+        finally:
+            view.release()
+    # End column
+# End class RecordLayout
+
+
+def _open_buffer(source):
+    """    Return (buffer, closer) for a path or an object supporting the
+    buffer protocol.
+    """
+    
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return source, None
+    
+    f = open(source, 'rb')
+    try:
+        if f.seek(0, 2) == 0:
+            f.close()
+            return b'', None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    
+    return mm, mm.close
+# End _open_buffer
+
+
+def _record_count(layout, buffer, header):
+    size, extra = divmod(len(buffer) - header, layout.size)
+    if extra:
+        raise ValueError("The data is not a whole number of {0} byte records".format(layout.size))
+    
+    return size
+# End _record_count
+
+
+def _order(layout, buffer, header, keys):
+    count = _record_count(layout, buffer, header)
+    plan = compile_keys(itemgetter, *keys)
+    if not plan.keys:
+        raise ValueError("At least one key is required")
+    
+    order = list(range(count))
+    for k, r in reversed(plan.keys):
+        column = layout.column(buffer, k, count, header)
+        order.sort(key=column.__getitem__, reverse=r)
+        del column
+    # End for
+    
+    return order
+# End _order
+
+
+def struct_argsort(source, fmt, names, *keys, **options):
+    """    struct_argsort(source, fmt, names, *keys, header=0) -> array of indexes
+    
+    Return the keyspec order of the fixed-width records in source (a path,
+    which is memory-mapped, or a bytes-like object) as an array of record
+    indexes. Keys are field names (or positions) with the usual '-'/' desc'
+    directionals. header is a number of bytes to skip before the first record.
+    """
+    
+    header = options.pop('header', 0)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    
+    layout = RecordLayout(fmt, names)
+    buffer, close = _open_buffer(source)
+    try:
+        order = _order(layout, buffer, header, keys)
+    finally:
+        if close is not None:
+            close()
+    
+    return _index_array(order, len(order))
+# End struct_argsort
+
+
+def sort_struct_file(source, output, fmt, names, *keys, **options):
+    """    sort_struct_file(source, output, fmt, names, *keys, header=0) -> record count
+    
+    Write the fixed-width records of source to the path output in keyspec
+    order. Any header bytes are copied through unchanged. The records are
+    written to a temporary file next to output that then replaces it, so
+    output may be the source file itself.
+    """
+    
+    header = options.pop('header', 0)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    
+    layout = RecordLayout(fmt, names)
+    size = layout.size
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        buffer, close = _open_buffer(source)
+        try:
+            order = _order(layout, buffer, header, keys)
+            view = memoryview(buffer)
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    fd = None
+                    out.write(view[:header])
+                    write = out.write
+                    for i in order:
+                        start = header + i * size
+                        write(view[start:start + size])
+                    # End for
+            finally:
+                view.release()
+        finally:
+            if close is not None:
+                close()
+        
+        os.replace(temp, output)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        os.remove(temp)
+        raise
+    
+    return len(order)
+# End sort_struct_file
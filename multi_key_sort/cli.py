@@ -0,0 +1,250 @@
+"""    Module: multi_key_sort.cli
+    Command line sorting of CSV and JSON Lines data by keyspecs.
+    
+    Run with:
+        python -m multi_key_sort [options] [FILE ...]
+    or the installed 'multi-key-sort' script.
+    
+    Ex:
+        multi-key-sort -k 'age desc' -k name -t age:int people.csv
+        cat events.jsonl | multi-key-sort -k=-priority -k created --top 50
+    
+    Records are streamed: input larger than --run-size records is sorted in
+    runs that are spilled to temporary files and merged, and --top N only
+    keeps N records in memory. Rows are written back as they were read;
+    type coercion only affects how keys compare.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from itertools import chain
+from operator import itemgetter
+
+from multi_key_sort import complex_topk, fields_getter, flatten_all, ResolveKeys, TransformedKey
+from multi_key_sort.external import external_sorted
+
+
+CONVERTERS = {
+    'int': int,
+    'float': float,
+    'str': str,
+}
+
+
+# Records held in memory per run before spilling; larger than the library 
+# default as CLI records are small lists
+CLI_RUN_SIZE = 1000000
+
+
+def _parse_types(specs):
+    """    Turn ['age:int', 'score:float'] into {'age': int, 'score': float}.
+    """
+    
+    types = {}
+    for spec in specs:
+        name, sep, typeName = spec.rpartition(':')
+        if not sep or typeName not in CONVERTERS:
+            raise ValueError("Bad --type {0!r}, expected FIELD:{1}".format(spec, '|'.join(sorted(CONVERTERS))))
+        types[name] = CONVERTERS[typeName]
+    # End for
+    
+    return types
+# End _parse_types
+
+
+def _field(key):
+    """    The field name of a resolved key and its modifier (or None).
+    """
+    
+    if isinstance(key, TransformedKey):
+        return str(key.key), key.modifier
+    
+    return str(key), None
+# End _field
+
+
+def _positional_keys(resolved, positions):
+    """    Rewrite resolved (key, doReverse) keys as positional keyspecs, 
+    keeping any modifier.
+    """
+    
+    res = []
+    for k, r in resolved:
+        name, modifier = _field(k)
+        res.append('{0}{1}{2}'.format('-' if r else '', positions[name], ' ' + modifier if modifier else ''))
+    # End for
+    
+    return res
+# End _positional_keys
+
+
+def read_jsonl(streams, resolved, types):
+    """    Yield one list per non-blank JSON Lines record: the values of the 
+    distinct key fields (which may be dotted paths) in key order, coerced 
+    by types, followed by the line as read.
+    """
+    
+    names = []
+    for k, r in resolved:
+        name = _field(k)[0]
+        if name not in names:
+            names.append(name)
+    converters = [(n, fields_getter(itemgetter, (n,)), types.get(n)) for n in names]
+    
+    for stream in streams:
+        for lineNumber, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            
+            fields = json.loads(line)
+            if not isinstance(fields, dict):
+                raise ValueError("Line {0}: expected a JSON object".format(lineNumber))
+            
+            try:
+                record = [g(fields) if c is None else c(g(fields)) for n, g, c in converters]
+            except (KeyError, IndexError) as e:
+                raise ValueError("Line {0}: missing field {1}".format(lineNumber, e))
+            except (TypeError, ValueError) as e:
+                raise ValueError("Line {0}: {1}".format(lineNumber, e))
+            
+            record.append(line if line.endswith('\n') else line + '\n')
+            yield record
+        # End for
+    # End for
+# End read_jsonl
+
+
+def read_csv(reader, typed):
+    """    Yield the records of a csv reader, each preceded by a coerced copy of 
+    each typed column. typed is a list of (column, converter). The copies 
+    go first so that they keep their positions in rows with more fields 
+    than the header.
+    """
+    
+    for values in reader:
+        try:
+            values[0:0] = [convert(values[i]) for i, convert in typed]
+        except IndexError:
+            raise ValueError("Line {0}: too few fields".format(reader.line_num))
+        except ValueError as e:
+            raise ValueError("Line {0}: {1}".format(reader.line_num, e))
+        yield values
+    # End for
+# End read_csv
+
+
+def _open_inputs(paths):
+    return [sys.stdin if path == '-' else io.open(path, newline='', encoding='utf-8') for path in paths]
+# End _open_inputs
+
+
+def _detect_format(paths):
+    for path in paths:
+        if path.endswith(('.jsonl', '.ndjson', '.json')):
+            return 'jsonl'
+    
+    return 'csv'
+# End _detect_format
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='multi-key-sort',
+                                     description='Sort CSV or JSON Lines records by multiple keys and directions.')
+    parser.add_argument('files', nargs='*', default=['-'], help="input files, '-' for stdin (default)")
+    parser.add_argument('-k', '--key', action='append', default=[], dest='keys', metavar='KEYSPEC',
+                        help="sort key such as 'age desc' (or -k=-age), 'name' or 'name ci'; most significant first")
+    parser.add_argument('-t', '--type', action='append', default=[], dest='types', metavar='FIELD:TYPE',
+                        help='compare FIELD as int, float or str (default str for CSV)')
+    parser.add_argument('-f', '--format', choices=('csv', 'jsonl'), help='input format (default from the file names, else csv)')
+    parser.add_argument('-d', '--delimiter', default=',', help='CSV field delimiter')
+    parser.add_argument('--top', type=int, metavar='N', help='only output the first N records')
+    parser.add_argument('--run-size', type=int, default=CLI_RUN_SIZE, metavar='N',
+                        help='records sorted in memory before spilling to disk (default %(default)s)')
+    parser.add_argument('--tempdir', help='directory for spilled runs')
+    parser.add_argument('-o', '--output', help='output file (default stdout)')
+    args = parser.parse_args(argv)
+    
+    if not args.keys:
+        parser.error('at least one -k/--key is required')
+    
+    try:
+        types = _parse_types(args.types)
+    except ValueError as e:
+        parser.error(str(e))
+    
+    fmt = args.format or _detect_format(args.files)
+    resolved = list(ResolveKeys(flatten_all(args.keys)))
+    resolved.reverse()
+    try:
+        inputs = _open_inputs(args.files)
+    except (IOError, OSError) as e:
+        sys.stderr.write('multi-key-sort: {0}\n'.format(e))
+        return 1
+    out = io.open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    
+    try:
+        if fmt == 'jsonl':
+            positions = {}
+            for k, r in resolved:
+                positions.setdefault(_field(k)[0], len(positions))
+            keys = _positional_keys(resolved, positions)
+            rows = read_jsonl(inputs, resolved, types)
+        else:
+            # Every file must share the first file's header
+            readers = [csv.reader(f, delimiter=args.delimiter) for f in inputs]
+            header = next(readers[0], [])
+            positions = dict((str(k), i) for i, k in enumerate(header))
+            missing = [k for k in chain((_field(k)[0] for k, r in resolved), types) if k not in positions]
+            if missing:
+                raise ValueError("No field(s) named {0} in the header".format(', '.join(missing)))
+            
+            # Typed fields are compared through coerced copies put in front 
+            # of the row, shifting the other fields
+            typed = [(positions[name], convert) for name, convert in types.items()]
+            if typed:
+                positions = dict((k, i + len(typed)) for k, i in positions.items())
+                for i, name in enumerate(types):
+                    positions[name] = i
+            keys = _positional_keys(resolved, positions)
+            
+            def rows_for(i):
+                if i:
+                    next(readers[i], None)
+                return read_csv(readers[i], typed) if typed else readers[i]
+            
+            rows = chain.from_iterable(rows_for(i) for i in range(len(readers)))
+        # End readers
+        
+        if args.top is not None:
+            result = complex_topk(rows, args.top, itemgetter, *keys)
+        else:
+            result = external_sorted(rows, itemgetter, *keys, run_size=args.run_size, tempdir=args.tempdir)
+        
+        if fmt == 'jsonl':
+            out.writelines(map(itemgetter(-1), result))
+        else:
+            writer = csv.writer(out, delimiter=args.delimiter, lineterminator='\n')
+            writer.writerow(header)
+            writer.writerows((row[len(typed):] for row in result) if typed else result)
+        # End write
+    except IndexError:
+        sys.stderr.write('multi-key-sort: a record has too few fields\n')
+        return 1
+    except TypeError as e:
+        sys.stderr.write('multi-key-sort: cannot compare the keys of two records ({0}); use -t/--type\n'.format(e))
+        return 1
+    except ValueError as e:
+        sys.stderr.write('multi-key-sort: {0}\n'.format(e))
+        return 1
+    finally:
+        for f in inputs:
+            if f is not sys.stdin:
+                f.close()
+        if args.output:
+            out.close()
+    
+    return 0
+# End main
@@ -0,0 +1,168 @@
+"""    Module: multi_key_sort.collection
+    A list-like container that keeps its records in keyspec order as they 
+    are added and removed.
+"""
+
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from multi_key_sort import compile_keys
+
+
+class SortedCollection(object):
+    """    SortedCollection(iterable=(), keys=(), getter=operator.itemgetter)
+    
+    Keep records sorted by keyspecs (same grammar as complex_sorted). The 
+    keyspecs are compiled once; each record's key is computed once when it 
+    is added and lookups use bisection.
+    
+    Records with equal keys stay in the order they were added, so iterating 
+    gives the same order complex_sorted would give for the records in 
+    insertion order.
+    
+    Ex:
+        orders = SortedCollection(keys=('-priority', 'created'))
+        orders.add({'priority': 2, 'created': 10})
+        orders[0], orders[:10], len(orders)
+    """
+    
+    def __init__(self, iterable=(), keys=(), getter=itemgetter):
+        if isinstance(keys, str):
+            keys = (keys,)
+        
+        self.plan = compile_keys(getter, keys)
+        self._key = self.plan.record_key
+        self._items = []
+        self._keys = []
+        
+        self.update(iterable)
+    # End __init__
+    
+    def __repr__(self):
+        return '{0}({1!r}, keys={2!r})'.format(self.__class__.__name__, self._items, self.plan.keys)
+    
+    def __len__(self):
+        return len(self._items)
+    
+    def __iter__(self):
+        return iter(self._items)
+    
+    def __reversed__(self):
+        return reversed(self._items)
+    
+    def __getitem__(self, index):
+        return self._items[index]
+    
+    def __delitem__(self, index):
+        del self._items[index]
+        del self._keys[index]
+    
+    def __contains__(self, item):
+        try:
+            self.index(item)
+        except ValueError:
+            return False
+        
+        return True
+    # End __contains__
+    
+    def add(self, item):
+        """    Insert item after any records with an equal key.
+        """
+        
+        k = self._key(item)
+        i = bisect_right(self._keys, k)
+        self._keys.insert(i, k)
+        self._items.insert(i, item)
+    # End add
+    
+    def update(self, iterable):
+        """    Add every record of iterable. Large batches are merged with one 
+        sort instead of one insertion each.
+        """
+        
+        new = list(iterable)
+        if len(new) * 8 < len(self._items):
+            for item in new:
+                self.add(item)
+            return
+        # End small batch
+        
+        items = self._items + new
+        self.plan.sort_list(items)
+        self._items = items
+        self._keys = list(map(self._key, items))
+    # End update
+    
+    def _span(self, item):
+        k = self._key(item)
+        
+        return bisect_left(self._keys, k), bisect_right(self._keys, k)
+    # End _span
+    
+    def index(self, item):
+        """    Return the position of the first record equal to item. 
+        Raises ValueError if it is not present.
+        """
+        
+        lo, hi = self._span(item)
+        for i in range(lo, hi):
+            if self._items[i] == item:
+                return i
+        # End for
+        
+        raise ValueError("{0!r} is not in the collection".format(item))
+    # End index
+    
+    def count(self, item):
+        """    Return the number of records equal to item.
+        """
+        
+        lo, hi = self._span(item)
+        
+        return sum(1 for i in range(lo, hi) if self._items[i] == item)
+    # End count
+    
+    def remove(self, item):
+        """    Remove the first record equal to item. 
+        Raises ValueError if it is not present.
+        """
+        
+        del self[self.index(item)]
+    # End remove
+    
+    def discard(self, item):
+        """    Remove the first record equal to item if it is present.
+        """
+        
+        try:
+            self.remove(item)
+        except ValueError:
+            pass
+    # End discard
+    
+    def pop(self, index=-1):
+        """    Remove and return the record at index (default last).
+        """
+        
+        self._keys.pop(index)
+        
+        return self._items.pop(index)
+    # End pop
+    
+    def clear(self):
+        del self._items[:]
+        del self._keys[:]
+    
+    def bisect_left(self, item):
+        """    Position where item would be inserted before records with an equal key.
+        """
+        
+        return bisect_left(self._keys, self._key(item))
+    
+    def bisect_right(self, item):
+        """    Position where item would be inserted after records with an equal key.
+        """
+        
+        return bisect_right(self._keys, self._key(item))
+# End class SortedCollection
@@ -0,0 +1,236 @@
+"""    Module: multi_key_sort.columnar
+    Optional NumPy backend for multiple-key, multiple-direction stable sorts.
+    
+    Each resolved key is extracted once into a typed column: integers and 
+    booleans as int64, floats as float64, strings and bytes as int64 ranks. 
+    Descending columns are inverted (bitwise for integers, negated for floats, 
+    rank-inverted otherwise) and numpy.lexsort produces the stable permutation 
+    in a single vectorized step.
+    
+    Low-cardinality keys (strings or bytes with few distinct values) and 
+    integers spanning a small range are stored as offsets in uint8 or uint16 
+    columns instead. When any column is that narrow the permutation is built 
+    with one stable argsort per key, least significant first, so NumPy can 
+    use its LSD radix sort for the narrow columns.
+    
+    Columns of any other type, mixed types, NaN or out of range integers are 
+    not handled here; lexsort_order returns None and the caller falls back to 
+    the pure Python path, which produces the same order.
+    
+    SortPlan only selects the backend where it beats the pure Python path 
+    (see selected and RANKED_MIN_REPEAT); lexsort_order can always be 
+    called directly.
+"""
+
+from itertools import islice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The backend is only selected automatically for inputs of at least 
+# NUMPY_MIN_SIZE records sorted by at least NUMPY_MIN_KEYS keys. Extracting 
+# and converting the columns costs about as much as one pure Python pass, 
+# which list.sort makes very fast for a single plain key, so NumPy only wins 
+# once it replaces several passes (see python -m multi_key_sort.bench).
+NUMPY_MIN_SIZE = 10000
+NUMPY_MIN_KEYS = 3
+
+# Plans with modifier keys extract their columns anyway, so the backend 
+# already wins from this many keys
+TRANSFORMED_MIN_KEYS = 2
+
+# Automatic selection also gives up on string or bytes columns with more 
+# than one distinct value per RANKED_MIN_REPEAT records: ranking them needs 
+# a Python sort of the distinct values, which costs as much as the pure 
+# Python pass it would replace
+RANKED_MIN_REPEAT = 8
+_RANKED_SAMPLE = 1000
+
+_INT_TYPES = frozenset((int, bool))
+_FLOAT_TYPES = frozenset((float,))
+_RANKED_TYPES = (frozenset((str,)), frozenset((bytes,)))
+
+# Columns with at most this many distinct offsets are stored as uint8/uint16
+_NARROW_LIMITS = ((0xff, 'uint8'), (0xffff, 'uint16'))
+
+
+def _narrow_dtype(span):
+    """    The smallest unsigned dtype holding offsets 0..span, or None.
+    """
+    
+    for limit, dtype in _NARROW_LIMITS:
+        if span <= limit:
+            return getattr(numpy, dtype)
+    
+    return None
+# End _narrow_dtype
+
+
+def is_narrow(column):
+    """    True for columns NumPy sorts with a radix sort.
+    """
+    
+    return column.dtype.itemsize <= 2
+# End is_narrow
+
+
+def available():
+    """    True when NumPy could be imported.
+    """
+    
+    return numpy is not None
+# End available
+
+
+def _kind(values, minRepeat=1):
+    """    Return the set of value types of one list of key values, with the 
+    set of distinct values for strings or bytes: (types, distinct), or 
+    None when the column cannot be represented (unsupported or mixed types, 
+    or strings or bytes with more than one distinct value per minRepeat 
+    values). This is checked for every column before any is converted.
+    """
+    
+    types = set(map(type, values))
+    
+    if types <= _INT_TYPES or types <= _FLOAT_TYPES:
+        return types, None
+    elif types in _RANKED_TYPES:
+        # A leading sample rejects high-cardinality columns cheaply
+        sample = values[:_RANKED_SAMPLE]
+        if len(set(sample)) * minRepeat > len(sample):
+            return None
+        distinct = set(values)
+        if len(distinct) * minRepeat > len(values):
+            return None
+        return types, distinct
+    
+    return None
+# End _kind
+
+
+def _column(values, reverse, minRepeat=1, kind=None):
+    """    Convert one list of key values into a numpy array that sorts 
+    ascending in the requested direction, or None if it cannot be done 
+    without changing the order (see _kind, whose result may be passed in).
+    """
+    
+    kind = kind or _kind(values, minRepeat)
+    if kind is None:
+        return None
+    types, distinct = kind
+    
+    if distinct is not None:
+        distinct = sorted(distinct, reverse=reverse)
+        ranks = dict(zip(distinct, range(len(distinct))))
+        dtype = _narrow_dtype(len(distinct) - 1) or numpy.int64
+        return numpy.fromiter(map(ranks.__getitem__, values), dtype=dtype, count=len(values))
+    elif not values:
+        return numpy.zeros(0, dtype=numpy.uint8)
+    elif types <= _INT_TYPES:
+        lo = min(values)
+        hi = max(values)
+        narrow = _narrow_dtype(hi - lo)
+        if narrow is not None:
+            offsets = [hi - v for v in values] if reverse else [v - lo for v in values]
+            return numpy.array(offsets, dtype=narrow)
+        # End narrow
+        
+        try:
+            column = numpy.array(values, dtype=numpy.int64)
+        except OverflowError:
+            return None
+        return numpy.invert(column) if reverse else column
+    
+    column = numpy.array(values, dtype=numpy.float64)
+    if numpy.isnan(column).any():
+        return None
+    return numpy.negative(column) if reverse else column
+# End _column
+
+
+def lexsort_order(plan, records, minRepeat=1):
+    """    lexsort_order(plan, records, minRepeat=1) -> list of indexes or None
+    
+    Return the indexes of the sequence records in the order of the SortPlan 
+    plan, or None when NumPy is missing or a key column cannot be 
+    represented exactly (or is a string or bytes column with more than one 
+    distinct value per minRepeat records).
+    """
+    
+    if numpy is None or not plan.keys:
+        return None
+    
+    # Reject unsupported columns on a leading sample before extracting any
+    sample = list(islice(records, _RANKED_SAMPLE))
+    for g in plan.getters:
+        if _kind(list(map(g, sample)), minRepeat) is None:
+            return None
+    # End for
+    
+    return lexsort_columns(plan, (list(map(g, records)) for g in plan.getters), minRepeat)
+# End lexsort_order
+
+
+def selected(plan, size):
+    """    True when the backend is selected automatically for sorting size 
+    records by plan: NumPy is installed and both size and the number of 
+    keys are large enough for it to beat the pure Python path.
+    """
+    
+    minKeys = TRANSFORMED_MIN_KEYS if plan.transformed else NUMPY_MIN_KEYS
+    
+    return numpy is not None and size >= NUMPY_MIN_SIZE and len(plan.keys) >= minKeys
+# End selected
+
+
+def lexsort_columns(plan, values, minRepeat=1):
+    """    lexsort_columns(plan, values, minRepeat=1) -> list of indexes or None
+    
+    As lexsort_order for key values that were already extracted: values 
+    holds one list per key of plan, in plan order. It may be an iterator, 
+    which is only advanced until a column cannot be represented. String 
+    and bytes columns with more than one distinct value per minRepeat 
+    values are not represented.
+    """
+    
+    if numpy is None:
+        return None
+    
+    kinds = []
+    for v in values:
+        kind = _kind(v, minRepeat)
+        if kind is None:
+            return None
+        kinds.append((v, kind))
+    # End for
+    
+    columns = []
+    for (k, r), (v, kind) in zip(plan.keys, kinds):
+        column = _column(v, r, kind=kind)
+        if column is None:
+            return None
+        columns.append(column)
+    # End for
+    
+    if any(map(is_narrow, columns)):
+        # Least significant key first; stable argsort is a radix sort for 
+        # the narrow columns
+        order = None
+        for column in reversed(columns):
+            if order is None:
+                order = numpy.argsort(column, kind='stable')
+            else:
+                order = order[numpy.argsort(column[order], kind='stable')]
+        # End for
+        
+        return order.tolist()
+    # End radix
+    
+    # lexsort treats its last column as the primary key
+    columns.reverse()
+    
+    return numpy.lexsort(columns).tolist()
+# End lexsort_columns
@@ -0,0 +1,207 @@
+"""    Module: multi_key_sort.external
+    Out-of-core multiple-key, multiple-direction stable sort and lazy 
+    merging of already sorted streams.
+    
+    The input is consumed in runs of at most run_size records. Each run is 
+    sorted with the same plan complex_sorted would use and spilled to a 
+    temporary file; the runs are then merged lazily. Only one run plus one 
+    record per spilled run is held in memory at a time.
+"""
+
+import heapq
+import pickle
+import tempfile
+from itertools import islice
+from operator import itemgetter, attrgetter
+
+from multi_key_sort import compile_keys, _Reversed
+
+
+DEFAULT_RUN_SIZE = 100000
+
+
+def _decorated(iterable, key, index):
+    for position, record in enumerate(iterable):
+        yield key(record), index, position, record
+# End _decorated
+
+
+try:
+    heapq.merge(key=None, reverse=False)
+    _merge = heapq.merge
+except TypeError:
+    # heapq.merge takes key and reverse from Python 3.5 on. Before, records 
+    # are merged as (key, iterable index, position, record), which keeps 
+    # equal keys in iterable then input order and never compares records.
+    def _merge(*iterables, **options):
+        key = options.get('key')
+        if key is None:
+            return heapq.merge(*iterables)
+        if options.get('reverse'):
+            forward = key
+            key = lambda record: _Reversed(forward(record))
+        
+        merged = heapq.merge(*[_decorated(it, key, i) for i, it in enumerate(iterables)])
+        
+        return (item[3] for item in merged)
+    # End _merge
+
+
+def _spill(records, serializer, tempdir):
+    """    Write records to a new anonymous temporary file and return the file 
+    rewound to its start.
+    """
+    
+    runFile = tempfile.TemporaryFile(dir=tempdir)
+    try:
+        dump = serializer.dump
+        for record in records:
+            dump(record, runFile)
+        runFile.seek(0)
+    except:
+        runFile.close()
+        raise
+    
+    return runFile
+# End _spill
+
+
+def _read_run(runFile, serializer):
+    """    Yield the records of a spilled run. The file is closed when the 
+    run is exhausted or the generator is closed.
+    """
+    
+    load = serializer.load
+    try:
+        while True:
+            try:
+                record = load(runFile)
+            except EOFError:
+                break
+            yield record
+        # End while
+    finally:
+        runFile.close()
+# End _read_run
+
+
+def merge_plan(plan, *iterables):
+    """    merge_plan(plan, *iterables) -> generator
+    
+    Lazily merge iterables that are each already in the order of the 
+    SortPlan plan. Records that compare equal are taken from the earlier 
+    iterable first, so merging consecutive sorted runs is stable.
+    """
+    
+    if plan.keyfunc is not None:
+        return _merge(*iterables, key=plan.keyfunc, reverse=plan.reverse)
+    elif not plan.keys:
+        return _merge(*iterables)
+    
+    return _merge(*iterables, key=plan.record_key)
+# End merge_plan
+
+
+def imerge(*iterables, **options):
+    """    imerge(*iterables, keys=(), getter=operator.itemgetter) -> generator
+    
+    Lazily merge iterables that are each already sorted by the keyspecs in 
+    keys, in O(total * log k) for k iterables. The keyspecs use the same 
+    grammar as complex_sorted, so every key has its own direction:
+    
+        imerge(shard1, shard2, shard3, keys=('region', 'name desc'))
+    
+    Records that compare equal are taken from the earlier iterable first, 
+    so the output equals complex_sorted over the concatenated inputs.
+    """
+    
+    keys = options.pop('keys', ())
+    getter = options.pop('getter', itemgetter)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    if isinstance(keys, str):
+        keys = (keys,)
+    
+    return merge_plan(compile_keys(getter, keys), *iterables)
+# End imerge
+
+
+def external_sorted(iterable, getter, *keys, **options):
+    """    external_sorted(iterable, getter, *keys, **options) -> generator
+    
+    Sort an iterable that may not fit in memory. The result is the same 
+    stable order as complex_sorted(iterable, getter, *keys), produced lazily.
+    
+    Options:
+        run_size    - maximum number of records held in memory for one run 
+                      (default 100000)
+        serializer  - module or object with dump(obj, file) and load(file) 
+                      where load raises EOFError at the end of the file 
+                      (default pickle)
+        tempdir     - directory for the run files (default: tempfile's default)
+    
+    Ex:
+        for row in external_sorted(reader, itemgetter, 'age desc', 'name', run_size=500000):
+            ...
+    """
+    
+    runSize = options.pop('run_size', DEFAULT_RUN_SIZE)
+    serializer = options.pop('serializer', pickle)
+    tempdir = options.pop('tempdir', None)
+    if options:
+        raise TypeError("Unexpected option(s): {0}".format(', '.join(sorted(options))))
+    if runSize < 1:
+        raise ValueError("run_size must be at least 1")
+    
+    plan = compile_keys(getter, *keys)
+    
+    return _external_sorted(iter(iterable), plan, runSize, serializer, tempdir)
+# End external_sorted
+
+
+def _external_sorted(iterator, plan, runSize, serializer, tempdir):
+    runs = []
+    try:
+        while True:
+            chunk = list(islice(iterator, runSize))
+            if not chunk:
+                break
+            plan.sort_list(chunk)
+            
+            if not runs and len(chunk) < runSize:
+                # Everything fit in a single run, nothing to spill
+                for record in chunk:
+                    yield record
+                return
+            
+            runs.append(_spill(chunk, serializer, tempdir))
+            del chunk
+        # End while
+        
+        readers = [_read_run(f, serializer) for f in runs]
+        for record in merge_plan(plan, *readers):
+            yield record
+    finally:
+        for f in runs:
+            f.close()
+# End _external_sorted
+
+
+def iexternal_sorted(iterable, *keys, **options):
+    """    iexternal_sorted(iterable, *keys, **options) -> generator
+    
+    external_sorted using operator.itemgetter.
+    """
+    
+    return external_sorted(iterable, itemgetter, *keys, **options)
+# End iexternal_sorted
+
+
+def aexternal_sorted(iterable, *keys, **options):
+    """    aexternal_sorted(iterable, *keys, **options) -> generator
+    
+    external_sorted using operator.attrgetter.
+    """
+    
+    return external_sorted(iterable, attrgetter, *keys, **options)
+# End aexternal_sorted
@@ -0,0 +1,177 @@
+"""    Module: multi_key_sort.grouping
+    Sorting fused with grouping: grouped_sorted and distinct_on.
+    
+    The group key of each record is extracted once. Records are partitioned 
+    by it in a dict, only the distinct group keys are sorted by the group 
+    keyspecs and each group is sorted alone by the order keyspecs, which is 
+    cheaper than sorting everything by both and grouping afterwards. Group 
+    keys that cannot be hashed fall back to one sort of record indexes, 
+    grouped with the already extracted group key column.
+    
+    Ex:
+        for (region, sex), rows in grouped_sorted(data, ('region', '-sex'), ('-age', 'name')):
+            ...
+        newest = distinct_on(events, 'user', '-ts')
+"""
+
+from itertools import groupby
+from operator import itemgetter
+
+from multi_key_sort import compile_keys, fields_getter, _tuple_getter
+
+
+def _as_keys(keys):
+    return (keys,) if isinstance(keys, str) else tuple(keys)
+# End _as_keys
+
+
+def _group_getter(plan):
+    """    A function returning the tuple of a record's group key values.
+    """
+    
+    if len(plan.keys) == 1:
+        g = plan.getters[0]
+        return lambda record: (g(record),)
+    # End single key
+    
+    return fields_getter(plan.getter, [k for k, r in plan.keys]) or _tuple_getter(plan.getters)
+# End _group_getter
+
+
+def _sorted_groups(plan, values):
+    """    Sort the distinct group key tuples values in place in the directions 
+    of plan.
+    """
+    
+    positional = ['{0}{1}'.format('-' if r else '', i) for i, (k, r) in enumerate(plan.keys)]
+    compile_keys(itemgetter, *positional).sort_list(values)
+# End _sorted_groups
+
+
+def _group_value(plan, value):
+    return value[0] if len(plan.keys) == 1 else value
+# End _group_value
+
+
+def _partition(groupKey, records):
+    """    {group key: list of records} in first-seen order, or None when a group 
+    key cannot be hashed.
+    """
+    
+    groups = {}
+    try:
+        for record in records:
+            k = groupKey(record)
+            group = groups.get(k)
+            if group is None:
+                groups[k] = [record]
+            else:
+                group.append(record)
+        # End for
+    except TypeError:
+        return None
+    
+    return groups
+# End _partition
+
+
+def _grouped_by_sort(getter, keys, groupPlan, groupKey, records):
+    """    Fallback for unhashable group keys: one stable sort of indexes by the 
+    group then order keyspecs, grouped on the extracted group key column.
+    """
+    
+    column = list(map(groupKey, records))
+    order = compile_keys(getter, *keys).order(records)
+    
+    return [(_group_value(groupPlan, k), [records[i] for i in indexes])
+            for k, indexes in groupby(order, column.__getitem__)]
+# End _grouped_by_sort
+
+
+def grouped_sorted(iterable, group_keys, order_keys=(), getter=itemgetter):
+    """    grouped_sorted(iterable, group_keys, order_keys=(), getter=itemgetter) -> list of (key, records)
+    
+    Return the groups of complex_sorted(iterable, getter, *group_keys, 
+    *order_keys) as itertools.groupby on the group keys would: a list of 
+    (group key, list of records) pairs. The group key is the value of the 
+    single group key, or a tuple of the values for several. Without 
+    order_keys the records of a group keep their input order.
+    
+    Ex:
+        grouped_sorted(data, ['sex'], ['age desc', 'name'])
+    """
+    
+    groupKeys = _as_keys(group_keys)
+    orderKeys = _as_keys(order_keys)
+    groupPlan = compile_keys(getter, *groupKeys)
+    orderPlan = compile_keys(getter, *orderKeys)
+    if not groupPlan.keys:
+        raise ValueError("At least one group key is required")
+    
+    records = list(iterable)
+    groupKey = _group_getter(groupPlan)
+    groups = _partition(groupKey, records)
+    if groups is None:
+        return _grouped_by_sort(getter, groupKeys + orderKeys, groupPlan, groupKey, records)
+    
+    values = list(groups)
+    _sorted_groups(groupPlan, values)
+    
+    res = []
+    for value in values:
+        group = groups.pop(value)
+        if orderPlan.keys:
+            orderPlan.sort_list(group)
+        res.append((_group_value(groupPlan, value), group))
+    # End for
+    
+    return res
+# End grouped_sorted
+
+
+def distinct_on(iterable, keys, order_keys=(), getter=itemgetter):
+    """    distinct_on(iterable, keys, order_keys=(), getter=itemgetter) -> new list
+    
+    Return the first record of each group of equal keys, in keyspec order, 
+    where first means first by order_keys (or in input order without 
+    order_keys), like SQL's DISTINCT ON. Only the best record of each group 
+    is kept per group as the records are read.
+    
+    Ex:
+        distinct_on(events, 'user', '-ts')   # the latest event of each user
+    """
+    
+    groupKeys = _as_keys(keys)
+    orderKeys = _as_keys(order_keys)
+    groupPlan = compile_keys(getter, *groupKeys)
+    orderPlan = compile_keys(getter, *orderKeys)
+    if not groupPlan.keys:
+        raise ValueError("At least one key is required")
+    
+    records = list(iterable)
+    groupKey = _group_getter(groupPlan)
+    orderKey = orderPlan.record_key if orderPlan.keys else None
+    
+    # group key -> (order key, record) of the best record so far
+    best = {}
+    for record in records:
+        k = groupKey(record)
+        try:
+            current = best.get(k)
+        except TypeError:
+            return [group[0] for k, group in
+                    _grouped_by_sort(getter, groupKeys + orderKeys, groupPlan, groupKey, records)]
+        
+        if current is None:
+            best[k] = (orderKey(record) if orderKey is not None else None, record)
+        elif orderKey is not None:
+            o = orderKey(record)
+            if o < current[0]:
+                best[k] = (o, record)
+    # End for
+    
+    values = list(best)
+    _sorted_groups(groupPlan, values)
+    
+    return [best[v][1] for v in values]
+# End distinct_on
@@ -0,0 +1,221 @@
+"""    Module: multi_key_sort.memo
+    Opt-in memoization of sort results.
+    
+    Results are kept as index permutations, keyed on a dataset version token 
+    supplied by the caller plus the resolved keyspec. Besides exact repeats, 
+    a request can be answered from a cached result for the exact reverse 
+    keyspec (every direction flipped) or extended from a cached result for a 
+    leading prefix of its keys, without a full sort.
+"""
+
+import sys
+from collections import namedtuple, OrderedDict
+from threading import Lock
+
+from multi_key_sort import compile_keys, fields_getter, _index_array, _move_to_end, _tuple_getter, _MULTI_FIELD_GETTERS
+
+
+ResultCacheInfo = namedtuple('ResultCacheInfo', 'hits reversed extended misses entries bytes')
+
+
+class SortResultCache(object):
+    """    SortResultCache(max_entries=128, max_bytes=None)
+    
+    LRU cache of sort permutations. The caller must pass a token that 
+    changes whenever the dataset changes, for example a version number or 
+    a (dataset id, version) pair; results for other tokens are never used.
+    
+    Ex:
+        cache = SortResultCache(max_entries=64)
+        cache.sort(('orders', version), rows, itemgetter, 'age', 'name')
+        cache.sort(('orders', version), rows, itemgetter, '-age', '-name')   # reversed, no sort
+    """
+    
+    def __init__(self, max_entries=128, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.reversed = 0
+        self.extended = 0
+        self.misses = 0
+        self.bytes = 0
+        self._orders = OrderedDict()
+        self._lock = Lock()
+    # End __init__
+    
+    def info(self):
+        with self._lock:
+            return ResultCacheInfo(self.hits, self.reversed, self.extended, self.misses, 
+                                   len(self._orders), self.bytes)
+    # End info
+    
+    def clear(self):
+        with self._lock:
+            self._orders.clear()
+            self.bytes = 0
+            self.hits = self.reversed = self.extended = self.misses = 0
+    # End clear
+    
+    def _get(self, cacheKey):
+        with self._lock:
+            order = self._orders.get(cacheKey)
+            if order is not None:
+                _move_to_end(self._orders, cacheKey)
+            return order
+    # End _get
+    
+    def _put(self, cacheKey, order):
+        with self._lock:
+            old = self._orders.pop(cacheKey, None)
+            if old is not None:
+                self.bytes -= sys.getsizeof(old)
+            
+            self._orders[cacheKey] = order
+            self.bytes += sys.getsizeof(order)
+            
+            while self._orders and ((len(self._orders) > self.max_entries) or 
+                                    (self.max_bytes is not None and self.bytes > self.max_bytes)):
+                k, evicted = self._orders.popitem(last=False)
+                self.bytes -= sys.getsizeof(evicted)
+        # End with
+    # End _put
+    
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+    # End _count
+    
+    def lookup(self, token, plan, records):
+        """    Return the cached or derived order (an array of indexes) of the 
+        sequence records for the SortPlan plan, or None on a miss.
+        """
+        
+        cacheKey = (token, plan.getter, plan.keys)
+        
+        order = self._get(cacheKey)
+        if order is not None:
+            self._count('hits')
+            return order
+        # End hit
+        
+        if plan.keys:
+            flipped = tuple((k, not r) for k, r in plan.keys)
+            order = self._get((token, plan.getter, flipped))
+            if order is not None:
+                self._count('reversed')
+                order = self._reverse(plan, records, order)
+                self._put(cacheKey, order)
+                return order
+        # End reversed
+        
+        for j in range(len(plan.keys) - 1, 0, -1):
+            order = self._get((token, plan.getter, plan.keys[:j]))
+            if order is not None:
+                self._count('extended')
+                order = self._extend(plan, records, order, j)
+                self._put(cacheKey, order)
+                return order
+        # End prefix
+        
+        self._count('misses')
+        
+        return None
+    # End lookup
+    
+    def store(self, token, plan, order, size):
+        """    Cache order, a sequence of indexes into a dataset of size records, 
+        for the SortPlan plan and return it as an array.
+        """
+        
+        order = _index_array(order, size)
+        self._put((token, plan.getter, plan.keys), order)
+        
+        return order
+    # End store
+    
+    def order(self, token, records, getter, *keys):
+        """    Return the keyspec order of the sequence records as an array of 
+        indexes, from the cache when possible.
+        """
+        
+        plan = compile_keys(getter, *keys)
+        
+        order = self.lookup(token, plan, records)
+        if order is None:
+            order = self.store(token, plan, plan.order(records), len(records))
+        
+        return order
+    # End order
+    
+    def sort(self, token, records, getter, *keys):
+        """    Return a new list of the records in keyspec order, from the cache 
+        when possible.
+        """
+        
+        return [records[i] for i in self.order(token, records, getter, *keys)]
+    # End sort
+    
+    def _values(self, plan, count):
+        """    A function returning the raw values of the first count keys.
+        """
+        
+        if plan.getter in _MULTI_FIELD_GETTERS:
+            return fields_getter(plan.getter, [k for k, r in plan.keys[:count]])
+        
+        return _tuple_getter(plan.getters[:count])
+    # End _values
+    
+    def _groups(self, plan, records, order, count):
+        """    Yield (start, stop) of each run of order whose records have equal 
+        values for the first count keys.
+        """
+        
+        values = self._values(plan, count)
+        start = 0
+        previous = None
+        for pos, i in enumerate(order):
+            v = values(records[i])
+            if pos and v != previous:
+                yield start, pos
+                start = pos
+            previous = v
+        # End for
+        
+        if len(order):
+            yield start, len(order)
+    # End _groups
+    
+    def _reverse(self, plan, records, order):
+        """    Reverse a cached order for the flipped keyspec. Records with equal 
+        keys must keep their original order, so each tie run is reversed back.
+        """
+        
+        res = order[::-1]
+        for start, stop in self._groups(plan, records, res, len(plan.keys)):
+            if stop - start > 1:
+                res[start:stop] = res[start:stop][::-1]
+        # End for
+        
+        return res
+    # End _reverse
+    
+    def _extend(self, plan, records, order, count):
+        """    Refine a cached order for the first count keys by sorting each run 
+        of ties by the remaining keys.
+        """
+        
+        res = list(order)
+        rest = list(zip(plan.getters[count:], [r for k, r in plan.keys[count:]]))
+        rest.reverse()
+        
+        for start, stop in self._groups(plan, records, res, count):
+            if stop - start > 1:
+                group = res[start:stop]
+                for g, r in rest:
+                    group.sort(key=lambda i: g(records[i]), reverse=r)
+                res[start:stop] = group
+        # End for
+        
+        return _index_array(res, len(records))
+    # End _extend
+# End class SortResultCache
@@ -0,0 +1,216 @@
+"""    Module: multi_key_sort.table
+    A row container that caches extracted key columns so the same data can 
+    be re-sorted by different keyspecs without calling the getters again.
+"""
+
+import sys
+from array import array
+from collections import OrderedDict
+from operator import itemgetter
+try:
+    from collections.abc import MutableSequence
+except ImportError:
+    from collections import MutableSequence
+
+from multi_key_sort import compile_keys, fields_getter, _index_array, _move_to_end
+
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+# Number of values, spread evenly over a column, whose sizes estimate the 
+# size of all of its values
+SIZE_SAMPLE = 100
+
+
+def column_bytes(column):
+    """    Estimate the memory of a key column: its list of references plus its 
+    values, extrapolated from the mean sys.getsizeof of up to SIZE_SAMPLE 
+    of them. Values shared with the rows are counted too, so this errs on 
+    the high side.
+    """
+    
+    size = sys.getsizeof(column)
+    if column:
+        sample = column[::max(len(column) // SIZE_SAMPLE, 1)]
+        size += sum(map(sys.getsizeof, sample)) * len(column) // len(sample)
+    
+    return size
+# End column_bytes
+
+
+class SortableTable(MutableSequence):
+    """    SortableTable(rows=(), getter=operator.itemgetter, max_cache_bytes=64 MiB, 
+                  result_cache=None)
+    
+    A mutable sequence of rows. The first time a key is used in a sort its 
+    values are extracted into a column and cached; later sorts by any 
+    keyspec that uses the key only read the cached column and sort an 
+    index permutation.
+    
+    Inserting, replacing or deleting rows through the table keeps the 
+    cached columns in step. If rows are changed in place (row['age'] = 3) 
+    call invalidate() for the affected keys.
+    
+    The cached columns are evicted least recently used first once their 
+    estimated total size (see column_bytes) passes max_cache_bytes. Every 
+    change increments 'version'.
+    
+    If result_cache is a multi_key_sort.memo.SortResultCache, sort orders 
+    are memoized in it against the table's current version.
+    
+    Ex:
+        table = SortableTable(rows)
+        table.sort('age desc', 'name')
+        table.sort('name')      # reuses the 'name' column
+    """
+    
+    def __init__(self, rows=(), getter=itemgetter, max_cache_bytes=DEFAULT_CACHE_BYTES, result_cache=None):
+        self.rows = list(rows)
+        self.getter = getter
+        self.max_cache_bytes = max_cache_bytes
+        self.result_cache = result_cache
+        # Identifies this table in a shared result cache; unlike id(self) it 
+        # cannot be reused by another table while the cache holds it
+        self._token = object()
+        self.version = 0
+        self.cache_bytes = 0
+        self._columns = OrderedDict()
+        # key -> the column's size as counted in cache_bytes
+        self._column_bytes = {}
+    # End __init__
+    
+    def __repr__(self):
+        return '{0}({1!r})'.format(self.__class__.__name__, self.rows)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __iter__(self):
+        return iter(self.rows)
+    
+    def __getitem__(self, index):
+        return self.rows[index]
+    
+    def __setitem__(self, index, row):
+        self.rows[index] = row
+        self.version += 1
+        if isinstance(index, slice):
+            self.invalidate()
+            return
+        # End slice
+        
+        for k, column in self._columns.items():
+            column[index] = fields_getter(self.getter, (k,))(row)
+    # End __setitem__
+    
+    def __delitem__(self, index):
+        del self.rows[index]
+        self.version += 1
+        for column in self._columns.values():
+            del column[index]
+    # End __delitem__
+    
+    def insert(self, index, row):
+        self.rows.insert(index, row)
+        self.version += 1
+        for k, column in self._columns.items():
+            column.insert(index, fields_getter(self.getter, (k,))(row))
+    # End insert
+    
+    def invalidate(self, *keys):
+        """    Drop the cached columns for keys (resolved key names, without 
+        directionals), or every cached column if no keys are given.
+        """
+        
+        self.version += 1
+        for k in (keys or list(self._columns)):
+            if self._columns.pop(k, None) is not None:
+                self.cache_bytes -= self._column_bytes.pop(k)
+        # End for
+    # End invalidate
+    
+    def cached_keys(self):
+        """    Return the keys that currently have a cached column, least 
+        recently used first.
+        """
+        
+        return list(self._columns)
+    # End cached_keys
+    
+    def column(self, key):
+        """    Return the cached column of values for a resolved key, extracting 
+        it first if needed.
+        """
+        
+        column = self._columns.get(key)
+        if column is not None:
+            _move_to_end(self._columns, key)
+            return column
+        # End hit
+        
+        column = list(map(fields_getter(self.getter, (key,)), self.rows))
+        self._columns[key] = column
+        self._column_bytes[key] = column_bytes(column)
+        self.cache_bytes += self._column_bytes[key]
+        
+        while self.cache_bytes > self.max_cache_bytes and len(self._columns) > 1:
+            k, evicted = self._columns.popitem(last=False)
+            self.cache_bytes -= self._column_bytes.pop(k)
+        # End evict
+        
+        return column
+    # End column
+    
+    def order(self, *keys):
+        """    Return the row indexes in keyspec order as a list, or as an array 
+        when it comes from the result cache.
+        """
+        
+        plan = compile_keys(self.getter, *keys)
+        
+        if self.result_cache is not None:
+            token = (self._token, self.version)
+            order = self.result_cache.lookup(token, plan, self.rows)
+            if order is None:
+                order = self.result_cache.store(token, plan, self._order(plan), len(self.rows))
+            return order
+        # End cached
+        
+        return self._order(plan)
+    # End order
+    
+    def _order(self, plan):
+        if not plan.keys:
+            return sorted(range(len(self.rows)), key=self.rows.__getitem__)
+        
+        # Fetch every column before sorting so eviction cannot drop one mid-sort
+        columns = [(self.column(k), r) for k, r in plan.keys]
+        
+        res = list(range(len(self.rows)))
+        for column, r in reversed(columns):
+            res.sort(key=column.__getitem__, reverse=r)
+        # End for
+        
+        return res
+    # End _order
+    
+    def argsort(self, *keys):
+        """    Return the keyspec order as an array of row indexes.
+        """
+        
+        order = self.order(*keys)
+        
+        return order if isinstance(order, array) else _index_array(order, len(self.rows))
+    # End argsort
+    
+    def sort(self, *keys):
+        """    Return a new list of the rows in keyspec order. The table itself 
+        is not reordered.
+        """
+        
+        rows = self.rows
+        
+        return [rows[i] for i in self.order(*keys)]
+    # End sort
+# End class SortableTable
+
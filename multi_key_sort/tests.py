@@ -262,5 +262,727 @@ class FunctionalTests(unittest.TestCase):
         self.assertTrue(all(cmpVector), "The tuple subclass instance was changed, but should have stayed static")
         self.assertEqual(expectedOutput, actualOutput, "msort output differs from expected output.")
     # End test_msort_tuple
+    
+    
+    def test_plan_sort_strategy(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        self.assertEqual('default', mks.plan_sort(itemgetter).strategy)
+        self.assertEqual('composite', mks.plan_sort(itemgetter, '-age').strategy)
+        self.assertEqual('composite', mks.plan_sort(itemgetter, 'a', 'b', 'c', 'd', 'e').strategy)
+        self.assertEqual('grouped', mks.plan_sort(itemgetter, 'a', 'b', 'c', 'd', 'e', '-f').strategy)
+        self.assertEqual('multipass', mks.plan_sort(itemgetter, 'age', 'name desc').strategy)
+        self.assertEqual('multipass', mks.plan_sort(lambda k: itemgetter(k), 'a', 'b', 'c', 'd', 'e').strategy)
+    # End test_plan_sort_strategy
+    
+    
+    def test_plan_sort_strategies_agree(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 3)]
+        
+        for myKeys in (['sex', 'age'], ['-sex', '-age', 'name desc', '-idx', '-sex'], ['sex', 'age', 'name', 'sex', 'idx', '-sex'],
+                       ['-sex', 'name', '-age'], ['-idx', 'sex', 'age', 'name', 'sex', 'idx']):
+            expectedOutput = mks.SortPlan(lambda k: itemgetter(k), mks.plan_sort(itemgetter, *myKeys).keys).sort(myData)
+            actualOutput = mks.complex_sorted(myData, itemgetter, *myKeys)
+            
+            self.assertEqual(expectedOutput, actualOutput, "Planned sort differs from the multi-pass sort for {0}.".format(myKeys))
+    # End test_plan_sort_strategies_agree
+    
+    
+    def test_compile_keys_cache(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        mks.plan_cache_clear()
+        
+        plan = mks.compile_keys(itemgetter, 'age desc', ['name'])
+        samePlan = mks.compile_keys(itemgetter, 'age desc', ['name'])
+        info = mks.plan_cache_info()
+        
+        self.assertTrue(plan is samePlan, "compile_keys did not return the cached plan")
+        self.assertEqual((1, 1, 1), (info.hits, info.misses, info.currsize))
+        self.assertEqual(hash(plan), hash(mks.plan_sort(itemgetter, '-age', 'name')))
+        self.assertEqual(plan, mks.plan_sort(itemgetter, '-age', 'name'))
+        self.assertEqual(mks.isorted(self.sampleData, 'age desc', 'name'), plan.sort(self.sampleData))
+        
+        mks.plan_cache_clear()
+        self.assertEqual((0, 0, 0), tuple(mks.plan_cache_info()[i] for i in (0, 1, 3)))
+    # End test_compile_keys_cache
+    
+    
+    def test_isorted_topk(self):
+        import multi_key_sort as mks
+        
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 4)]
+        
+        for myKeys in (['age'], ['-age', 'sex desc'], ['sex', '-age'], ['-sex', 'name', '-age']):
+            for n in (0, 1, 5, 100):
+                expectedOutput = mks.isorted(myData, *myKeys)[:n]
+                actualOutput = mks.isorted_topk(myData, n, *myKeys)
+                
+                self.assertEqual(expectedOutput, actualOutput, "isorted_topk output differs for {0}.".format(myKeys))
+        # End for
+        
+        self.assertRaises(ValueError, mks.isorted_topk, myData, -1, 'age')
+    # End test_isorted_topk
+    
+    
+    def test_msort_topk(self):
+        import multi_key_sort as mks
+        import types
+        from operator import itemgetter
+        
+        class MyList(list):
+            pass
+        
+        myData = MyList(self.sampleData)
+        setattr(myData, 'getter', itemgetter)
+        setattr(myData, 'msort_topk', types.MethodType(mks.msort_topk, myData))
+        
+        actualOutput = myData.msort_topk(2, 'age', 'name desc')
+        
+        self.assertEqual([self.sampleData[4], self.sampleData[1]], actualOutput, "msort_topk output differs from expected output.")
+        self.assertEqual(self.sampleData, myData, "msort_topk should not change the instance")
+    # End test_msort_topk
+    
+    
+    def test_external_sorted(self):
+        import multi_key_sort as mks
+        
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 5)]
+        
+        for myKeys in (['age'], ['-age', 'sex desc'], ['sex', '-age'], ['-sex', 'name', '-age']):
+            for runSize in (1, 4, 30, 1000):
+                expectedOutput = mks.isorted(myData, *myKeys)
+                actualOutput = list(mks.iexternal_sorted(iter(myData), *myKeys, run_size=runSize))
+                
+                self.assertEqual(expectedOutput, actualOutput, "iexternal_sorted output differs for {0}.".format(myKeys))
+        # End for
+    # End test_external_sorted
+    
+    
+    def test_imerge(self):
+        import multi_key_sort as mks
+        
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 3)]
+        
+        for myKeys in (('age',), ('-age', 'sex desc'), ('sex', '-age'), ('-sex', 'name desc', '-age')):
+            shards = [mks.isorted(myData[i::3], *myKeys) for i in range(3)]
+            expectedOutput = mks.isorted(shards[0] + shards[1] + shards[2], *myKeys)
+            actualOutput = list(mks.imerge(*shards, keys=myKeys))
+            
+            self.assertEqual(expectedOutput, actualOutput, "imerge output differs for {0}.".format(myKeys))
+        # End for
+        
+        self.assertEqual([3, 2, 1], list(mks.imerge([3, 1], [2], keys='0 desc', getter=lambda k: lambda x: x)))
+    # End test_imerge
+    
+    
+    def test_iargsort(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        myData = self.sampleData * 2
+        
+        for myKeys in (['age'], ['-age', 'sex desc'], ['sex', '-age'], ['-sex', 'name desc', '-age']):
+            order = mks.iargsort(myData, *myKeys)
+            
+            self.assertEqual(mks.isorted(myData, *myKeys), [myData[i] for i in order], "iargsort permutation differs for {0}.".format(myKeys))
+        # End for
+        
+        order = mks.complex_argsort(iter(myData), lambda k: itemgetter(k), 'sex', '-age')
+        self.assertEqual(mks.isorted(myData, 'sex', '-age'), [myData[i] for i in order], "complex_argsort (multipass) permutation differs.")
+    # End test_iargsort
+    
+    
+    def test_apply_permutation(self):
+        import multi_key_sort as mks
+        
+        names = [x['name'] for x in self.sampleData]
+        ages = [x['age'] for x in self.sampleData]
+        
+        sortedNames, sortedAges = mks.apply_permutation(mks.iargsort(self.sampleData, 'age', 'name desc'), names, ages)
+        
+        self.assertEqual(['Wallace', 'Sarah', 'Linda', 'Jim', 'Alex', 'Bill'], sortedNames)
+        self.assertEqual([20, 20, 25, 35, 35, 40], sortedAges)
+    # End test_apply_permutation
+    
+    
+    def test_columnar_lexsort(self):
+        import multi_key_sort as mks
+        from multi_key_sort import columnar
+        from operator import itemgetter
+        
+        if not columnar.available():
+            self.skipTest("NumPy is not installed")
+        
+        myData = [dict(x, idx=i, score=i * 0.5) for i, x in enumerate(self.sampleData * 3)]
+        
+        for myKeys in (['age'], ['-age', 'sex desc'], ['sex', '-age'], ['-sex', 'name', '-score']):
+            plan = mks.plan_sort(itemgetter, *myKeys)
+            order = columnar.lexsort_order(plan, myData)
+            
+            self.assertEqual(plan.sort(myData), [myData[i] for i in order], "lexsort_order differs for {0}.".format(myKeys))
+        # End for
+        
+        self.assertTrue(columnar.lexsort_order(mks.plan_sort(itemgetter, 'name'), myData, 4) is None, "Unique strings should fall back")
+        
+        myData[0]['age'] = '35'
+        self.assertTrue(columnar.lexsort_order(mks.plan_sort(itemgetter, 'age'), myData) is None, "Mixed types should fall back")
+        
+        # The backend is only selected automatically where it beats pure Python
+        size = columnar.NUMPY_MIN_SIZE
+        self.assertFalse(columnar.selected(mks.plan_sort(itemgetter, 'age'), size))
+        self.assertFalse(columnar.selected(mks.plan_sort(itemgetter, 'age', 'name', 'sex'), size - 1))
+        self.assertTrue(columnar.selected(mks.plan_sort(itemgetter, 'age', 'name', 'sex'), size))
+        self.assertTrue(columnar.selected(mks.plan_sort(itemgetter, 'name ci', '-age'), size))
+    # End test_columnar_lexsort
+    
+    
+    def test_columnar_narrow_columns(self):
+        import multi_key_sort as mks
+        from multi_key_sort import columnar
+        from operator import itemgetter
+        
+        if not columnar.available():
+            self.skipTest("NumPy is not installed")
+        
+        self.assertTrue(columnar.is_narrow(columnar._column(['M', 'F', 'M'], True)))
+        self.assertTrue(columnar.is_narrow(columnar._column([10 ** 12, 10 ** 12 + 300], False)))
+        self.assertFalse(columnar.is_narrow(columnar._column([0, 10 ** 12], False)))
+        
+        myData = [{'region': i % 5, 'big': (i * 7919) % 100003 * 10 ** 6, 'sex': 'MF'[i % 2]} for i in range(3000)]
+        for myKeys in (['region', '-big'], ['-sex', 'region'], ['sex', '-region', 'big']):
+            plan = mks.plan_sort(itemgetter, *myKeys)
+            order = columnar.lexsort_order(plan, myData)
+            
+            self.assertEqual(plan.sort(myData), [myData[i] for i in order], "Radix order differs for {0}.".format(myKeys))
+        # End for
+    # End test_columnar_narrow_columns
+    
+    
+    def test_sorted_collection(self):
+        import multi_key_sort as mks
+        
+        myKeys = ('-sex', 'age')
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 2)]
+        
+        coll = mks.SortedCollection(myData[:3], keys=myKeys)
+        for x in myData[3:]:
+            coll.add(x)
+        
+        self.assertEqual(mks.isorted(myData, *myKeys), list(coll), "SortedCollection order differs from isorted.")
+        self.assertEqual(list(coll)[2:5], coll[2:5])
+        self.assertEqual(len(myData), len(coll))
+        
+        coll.remove(myData[4])
+        self.assertFalse(myData[4] in coll, "Removed record is still in the collection")
+        self.assertTrue(myData[5] in coll)
+        self.assertRaises(ValueError, coll.remove, myData[4])
+        
+        coll.update(myData[:8])
+        expectedOutput = mks.isorted(myData[:4] + myData[5:] + myData[:8], *myKeys)
+        self.assertEqual(expectedOutput, list(coll), "SortedCollection order after update differs from isorted.")
+    # End test_sorted_collection
+    
+    
+    def test_mixed_numeric_descending(self):
+        import multi_key_sort as mks
+        from decimal import Decimal
+        
+        # Descending keys over ints, bools and Decimals, which compare with
+        # each other but cannot all be negated
+        myData = [{'a': v, 'b': b, 'g': i % 2} for i, (v, b) in
+                  enumerate([(1, 'x'), (Decimal('2'), 'y'), (True, 'z'), (Decimal('0.5'), 'w'), (2, 'v'), (False, 'u')])]
+        myKeys = ('-a', 'b')
+        expectedOutput = sorted(sorted(myData, key=lambda x: x['b']), key=lambda x: x['a'], reverse=True)
+        
+        self.assertEqual(expectedOutput, mks.isorted(myData, *myKeys))
+        self.assertEqual(expectedOutput[:3], mks.isorted_topk(myData, 3, *myKeys))
+        self.assertEqual(expectedOutput[2:4], mks.isorted_window(myData, 2, 2, *myKeys))
+        self.assertEqual(expectedOutput, list(mks.imerge(mks.isorted(myData[:3], *myKeys), mks.isorted(myData[3:], *myKeys), keys=myKeys)))
+        self.assertEqual(expectedOutput, list(mks.iexternal_sorted(iter(myData), *myKeys, run_size=2)))
+        self.assertEqual(expectedOutput, list(mks.SortedCollection(myData, keys=myKeys)))
+        self.assertEqual([x for x in expectedOutput if x['g'] == 0][:1] + [x for x in expectedOutput if x['g'] == 1][:1],
+                         mks.distinct_on(myData, 'g', myKeys))
+    # End test_mixed_numeric_descending
+    
+    
+    def test_sort_paths(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        myData = [dict(x, idx=i % 7) for i, x in enumerate(self.sampleData * 20)]
+        
+        for myKeys in (['age'], ['-age', '-idx'], ['sex', '-age'], ['sex', 'age', 'idx', 'name'], ['-sex', '-idx', '-age', '-name']):
+            plan = mks.plan_sort(itemgetter, *myKeys)
+            records = plan.sort(myData) + myData[:3]
+            expectedOutput = mks.isorted(records, *myKeys)
+            
+            mks.sort_path_clear()
+            self.assertEqual(expectedOutput, plan.sort(myData + myData[:3]), "Full sort output differs for {0}.".format(myKeys))
+            self.assertEqual(expectedOutput, plan.sort(expectedOutput), "Sorting presorted input changed it for {0}.".format(myKeys))
+            plan.sort_list(records)
+            
+            self.assertEqual(expectedOutput, records, "Tail merge output differs for {0}.".format(myKeys))
+            if len(myKeys) >= mks.PREFIX_CHECK_MIN_PASSES:
+                self.assertEqual({'presorted': 1, 'tail_merge': 1, 'full': 1}, mks.sort_path_info())
+            else:
+                # list.sort finds the sorted runs itself; unchecked sorts are not counted
+                self.assertEqual({'presorted': 0, 'tail_merge': 0, 'full': 0}, mks.sort_path_info())
+        # End for
+    # End test_sort_paths
+    
+    
+    def test_bench_run(self):
+        import sys
+        
+        if sys.version_info < (3,):
+            self.skipTest("multi_key_sort.bench needs Python 3")
+        
+        from multi_key_sort import bench
+        
+        results = bench.run([50], bench.RECORD_TYPES, [1, 3], bench.DIRECTIONS, bench.FUNCTIONS, repeat=1, out=None)
+        
+        # complex_sorted, msort and compact_sorted for every type, isorted or asorted depending on the getter
+        self.assertEqual(len(bench.RECORD_TYPES) * 2 * len(bench.DIRECTIONS) * 4, len(results))
+        self.assertTrue(all(r['seconds'] >= 0 and r['peak_bytes'] >= 0 for r in results))
+    # End test_bench_run
+    
+    
+    def test_profile_sorts(self):
+        import multi_key_sort as mks
+        
+        myKeys = ['age', 'name desc']
+        
+        with mks.profile_sorts() as profiles:
+            actualOutput = mks.isorted(self.sampleData, *myKeys)
+            mks.isorted(actualOutput, *myKeys)
+        
+        mks.isorted(self.sampleData, *myKeys)
+        
+        self.assertEqual(mks.plan_sort(mks._itemgetter, *myKeys).sort(self.sampleData), actualOutput)
+        self.assertEqual(2, len(profiles), "Sorts outside the block were profiled")
+        self.assertEqual(('complex_sorted', 6, 2, 'multipass', 'full'), 
+                         (profiles[0].function, profiles[0].size, profiles[0].key_count, profiles[0].strategy, profiles[0].path))
+        self.assertEqual(2, len(profiles[0].pass_seconds))
+        self.assertEqual(6 * 2, profiles[0].key_calls)
+        self.assertEqual('full', profiles[1].path)
+        self.assertEqual([], mks.sort_hooks)
+    # End test_profile_sorts
+    
+    
+    def test_sortable_table(self):
+        import multi_key_sort as mks
+        
+        table = mks.SortableTable(self.sampleData)
+        
+        for myKeys in (['age', 'name desc'], ['-sex', 'age'], ['name']):
+            self.assertEqual(mks.isorted(self.sampleData, *myKeys), table.sort(*myKeys), "SortableTable output differs for {0}.".format(myKeys))
+        
+        self.assertEqual(['sex', 'age', 'name'], table.cached_keys())
+        
+        newRow = {'name': 'Zed', 'age': 1, 'sex': 'M'}
+        table.append(newRow)
+        table[0] = {'name': 'Jim', 'age': 99, 'sex': 'M'}
+        del table[1]
+        
+        self.assertEqual(mks.isorted(list(table), 'age', 'name desc'), table.sort('age', 'name desc'))
+        self.assertEqual(newRow, table[table.argsort('age')[0]])
+        
+        table.rows[0]['age'] = 0
+        table.invalidate('age')
+        self.assertEqual(mks.isorted(list(table), 'age'), table.sort('age'))
+        
+        small = mks.SortableTable(self.sampleData, max_cache_bytes=1)
+        small.sort('age', 'name')
+        self.assertEqual(['name'], small.cached_keys(), "Only the most recently used column should be kept")
+        
+        # Column sizes include the values, not just the list of references
+        myData = [{'text': 'x' * 1000 + str(i)} for i in range(500)]
+        table = mks.SortableTable(myData)
+        table.sort('text')
+        self.assertTrue(table.cache_bytes > 500 * 1000)
+        table.invalidate()
+        self.assertEqual(0, table.cache_bytes)
+    # End test_sortable_table
+    
+    
+    def test_sort_result_cache(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        myData = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 3)]
+        cache = mks.SortResultCache(max_entries=10)
+        
+        for myKeys, expectedInfo in ((['sex', 'age'], (0, 0, 0, 1)), 
+                                     (['sex', 'age'], (1, 0, 0, 1)), 
+                                     (['-sex', '-age'], (1, 1, 0, 1)), 
+                                     (['sex', 'age', 'name desc'], (1, 1, 1, 1)), 
+                                     (['sex', 'age'], (2, 1, 1, 1))):
+            actualOutput = cache.sort(1, myData, itemgetter, *myKeys)
+            
+            self.assertEqual(mks.isorted(myData, *myKeys), actualOutput, "SortResultCache output differs for {0}.".format(myKeys))
+            self.assertEqual(expectedInfo, tuple(cache.info()[:4]))
+        # End for
+        
+        cache.sort(2, myData, itemgetter, 'sex', 'age')
+        self.assertEqual(2, cache.info().misses, "A new token must not reuse cached results")
+        
+        small = mks.SortResultCache(max_entries=1)
+        small.sort(1, myData, itemgetter, 'age')
+        small.sort(1, myData, itemgetter, 'name')
+        self.assertEqual(1, small.info().entries)
+    # End test_sort_result_cache
+    
+    
+    def test_sortable_table_result_cache(self):
+        import multi_key_sort as mks
+        
+        cache = mks.SortResultCache()
+        table = mks.SortableTable(self.sampleData, result_cache=cache)
+        
+        self.assertEqual(mks.isorted(self.sampleData, 'age', 'name'), table.sort('age', 'name'))
+        self.assertEqual(mks.isorted(self.sampleData, '-age', '-name'), table.sort('-age', '-name'))
+        
+        table.append({'name': 'Zed', 'age': 1, 'sex': 'M'})
+        self.assertEqual(mks.isorted(list(table), 'age', 'name'), table.sort('age', 'name'))
+        self.assertEqual((0, 1, 0, 2), tuple(cache.info()[:4]))
+    # End test_sortable_table_result_cache
+    
+    
+    def test_struct_argsort(self):
+        import sys
+        
+        if sys.version_info < (3,):
+            self.skipTest("multi_key_sort.binary needs Python 3")
+        
+        import multi_key_sort as mks
+        import os
+        import struct
+        import tempfile
+        
+        fmt = '<h 8s 2x c'
+        names = ('age', 'name', 'sex')
+        data = b''.join(struct.pack(fmt, x['age'], x['name'].encode(), x['sex'].encode()) for x in self.sampleData)
+        
+        order = mks.struct_argsort(data, fmt, names, 'age', 'name desc')
+        
+        self.assertEqual(mks.isorted(self.sampleData, 'age', 'name desc'), [self.sampleData[i] for i in order])
+        self.assertRaises(ValueError, mks.struct_argsort, data[:-1], fmt, names, 'age')
+        self.assertRaises(ValueError, mks.struct_argsort, data, 'h 8s 2x c', names, 'age')
+        
+        fd, source = tempfile.mkstemp()
+        os.close(fd)
+        output = source + '.sorted'
+        try:
+            with open(source, 'wb') as f:
+                f.write(b'HEAD' + data)
+            
+            mks.sort_struct_file(source, output, fmt, names, '-sex', '0', header=4)
+            
+            with open(output, 'rb') as f:
+                sortedData = f.read()
+        finally:
+            os.remove(source)
+            if os.path.exists(output):
+                os.remove(output)
+        
+        expectedOutput = [(x['age'], x['sex']) for x in mks.isorted(self.sampleData, '-sex', 'age')]
+        actualOutput = [(a, s.decode()) for a, n, s in struct.iter_unpack(fmt, sortedData[4:])]
+        
+        self.assertEqual(b'HEAD', sortedData[:4])
+        self.assertEqual(expectedOutput, actualOutput)
+        
+        # Sorting a file onto itself
+        fd, source = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with open(source, 'wb') as f:
+                f.write(b'HEAD' + data)
+            
+            self.assertEqual(len(self.sampleData), mks.sort_struct_file(source, source, fmt, names, '-sex', '0', header=4))
+            
+            with open(source, 'rb') as f:
+                self.assertEqual(sortedData, f.read())
+        finally:
+            os.remove(source)
+    # End test_struct_argsort
+    
+    
+    def test_cli(self):
+        import sys
+        
+        if sys.version_info < (3,):
+            self.skipTest("multi_key_sort.cli needs Python 3")
+        
+        import multi_key_sort as mks
+        from multi_key_sort import cli
+        import csv
+        import io
+        import json
+        import os
+        import shutil
+        import tempfile
+        
+        tempdir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(tempdir, 'people.csv')
+            with io.open(source, 'w', newline='') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(['name', 'age', 'sex'])
+                writer.writerows([x['name'], str(x['age'] * 3), x['sex']] for x in self.sampleData)
+            
+            output = os.path.join(tempdir, 'out.csv')
+            self.assertEqual(0, cli.main(['-k', 'age desc', '-k', 'name', '-t', 'age:int', '-o', output, source]))
+            with io.open(output, newline='') as f:
+                rows = list(csv.reader(f))
+            
+            expectedOutput = [[x['name'], str(x['age'] * 3)] for x in mks.isorted(self.sampleData, '-age', 'name')]
+            self.assertEqual(['name', 'age', 'sex'], rows[0])
+            self.assertEqual(expectedOutput, [r[:2] for r in rows[1:]])
+            
+            # Untyped ages compare as strings: '105' < '60'
+            self.assertEqual(0, cli.main(['-k', 'age', '--top', '1', '-o', output, source]))
+            with io.open(output, newline='') as f:
+                self.assertEqual(['Jim', '105', 'M'], list(csv.reader(f))[1])
+            
+            source = os.path.join(tempdir, 'people.jsonl')
+            with io.open(source, 'w') as f:
+                f.writelines(json.dumps(x) + '\n' for x in self.sampleData)
+            
+            output = os.path.join(tempdir, 'out.jsonl')
+            self.assertEqual(0, cli.main(['-k=-sex', '-k', 'age', '--run-size', '2', '-o', output, source]))
+            with io.open(output) as f:
+                actualOutput = [json.loads(line) for line in f]
+            
+            self.assertEqual(mks.isorted(self.sampleData, '-sex', 'age'), actualOutput)
+            self.assertEqual(1, cli.main(['-k', 'missing', '-o', output, source]))
+            
+            # Keys that do not compare are reported, not raised
+            with io.open(source, 'w') as f:
+                f.write(u'{"age": 1}\n{"age": "x"}\n')
+            self.assertEqual(1, cli.main(['-k', 'age', '-o', output, source]))
+            
+            # Rows with more fields than the header keep them and sort by the typed column
+            source = os.path.join(tempdir, 'extra.csv')
+            with io.open(source, 'w', newline='') as f:
+                f.write(u'name,age\nbob,30,extra\nann,4\ncy,100,more,fields\n')
+            
+            output = os.path.join(tempdir, 'out.csv')
+            self.assertEqual(0, cli.main(['-k', 'age', '-t', 'age:int', '-o', output, source]))
+            with io.open(output, newline='') as f:
+                rows = list(csv.reader(f))
+            self.assertEqual([['name', 'age'], ['ann', '4'], ['bob', '30', 'extra'], ['cy', '100', 'more', 'fields']], rows)
+        finally:
+            shutil.rmtree(tempdir)
+    # End test_cli
+    
+    
+    def test_dotted_paths(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        self.assertEqual(('customer', 'address', 'city'), mks.split_path('customer.address.city'))
+        self.assertEqual(('items', 0, 'price'), mks.split_path('items.0.price'))
+        self.assertEqual(('a.b',), mks.split_path('a\\.b'))
+        
+        myData = [{'customer': {'city': x['name']}, 'items': [{'price': x['age']}], 'a.b': x['sex']}
+                  for x in self.sampleData]
+        flatData = [{'city': x['customer']['city'], 'price': x['items'][0]['price'], 'ab': x['a.b']} for x in myData]
+        
+        expectedOutput = [myData[flatData.index(x)] for x in mks.isorted(flatData, 'ab', '-price', 'city')]
+        self.assertEqual(expectedOutput, mks.isorted(myData, 'a\\.b', '-items.0.price', 'customer.city'))
+        
+        plan = mks.compile_keys(itemgetter, 'items.0.price', 'customer.city')
+        self.assertEqual((20, 'Sarah'), plan.keyfunc(myData[1]))
+        self.assertEqual(mks.isorted(myData, '-customer.city')[:2], mks.isorted_topk(myData, 2, '-customer.city'))
+    # End test_dotted_paths
+    
+    
+    def test_key_modifiers(self):
+        import multi_key_sort as mks
+        
+        myKeys = ['name ci', '-version natural', 'tag desc natural']
+        expectedOutput = [(mks.TransformedKey('tag', 'natural'), True),
+                          (mks.TransformedKey('version', 'natural'), True),
+                          (mks.TransformedKey('name', 'ci'), False)]
+        self.assertEqual(expectedOutput, list(mks.ResolveKeys(myKeys)))
+        
+        self.assertEqual(('v', 1, '.', 10, ''), mks.natural_key('v1.10'))
+        
+        myData = [{'name': n, 'version': v} for n, v in [('bob', '1.10'), ('Alice', '1.9'), ('alice', '1.10'), ('Bob', '1.2')]]
+        expectedOutput = [myData[2], myData[1], myData[0], myData[3]]
+        self.assertEqual(expectedOutput, mks.isorted(myData, 'name ci', 'version natural desc'))
+        self.assertEqual(expectedOutput[::-1], mks.isorted(myData, 'name ci desc', 'version natural'))
+        self.assertEqual(expectedOutput[:2], mks.isorted_topk(myData, 2, 'name ci', '-version natural'))
+        
+        calls = []
+        def counted(value):
+            calls.append(value)
+            return value.lower()
+        
+        mks.KEY_MODIFIERS['counted'] = counted
+        try:
+            self.assertEqual(expectedOutput, mks.isorted(myData, 'name counted', '-version natural'))
+        finally:
+            del mks.KEY_MODIFIERS['counted']
+        
+        self.assertEqual(len(myData), len(calls), "Each transform should run once per record.")
+    # End test_key_modifiers
+    
+    
+    def test_sorted_async(self):
+        import sys
+        
+        if sys.version_info < (3, 7):
+            self.skipTest("multi_key_sort.aio needs Python 3.7 or later")
+        
+        # Compiled at run time so that this module still imports on Pythons 
+        # without async syntax
+        source = """if True:
+            import asyncio
+            from multi_key_sort import isorted
+            from multi_key_sort.aio import isorted_async, isorted_topk_async, imerge_async
+            
+            async def rows(data):
+                for row in data:
+                    await asyncio.sleep(0)
+                    yield row
+            
+            async def run():
+                expectedOutput = isorted(self.sampleData, '-sex', 'age', 'name desc')
+                
+                actualOutput = await isorted_async(rows(self.sampleData), '-sex', 'age', 'name desc', chunk_size=2)
+                self.assertEqual(expectedOutput, actualOutput)
+                actualOutput = await isorted_async(self.sampleData, '-sex', 'age', 'name desc')
+                self.assertEqual(expectedOutput, actualOutput)
+                
+                actualOutput = await isorted_topk_async(rows(self.sampleData), 3, '-sex', 'age', 'name desc', chunk_size=2)
+                self.assertEqual(expectedOutput[:3], actualOutput)
+                
+                first = isorted(self.sampleData[:3], 'age')
+                second = isorted(self.sampleData[3:], 'age')
+                actualOutput = [x async for x in imerge_async(rows(first), second, keys='age')]
+                self.assertEqual(isorted(self.sampleData, 'age'), actualOutput)
+            
+            asyncio.run(run())
+        """
+        exec(source, {'self': self})
+    # End test_sorted_async
+    
+    
+    def test_sorted_window(self):
+        import multi_key_sort as mks
+        
+        myKeys = ['age desc', 'sex']
+        expectedOutput = mks.isorted(self.sampleData, *myKeys)
+        
+        for offset, limit in [(0, 2), (2, 3), (5, 10), (10, 1), (0, 0)]:
+            actualOutput = mks.isorted_window(self.sampleData, offset, limit, *myKeys)
+            self.assertEqual(expectedOutput[offset:offset + limit], actualOutput)
+        # End for
+        
+        # Keyset pagination, including pages that split ties
+        pages = []
+        after = None
+        while True:
+            page = mks.isorted_window(self.sampleData, 0, 2, *myKeys, after=after)
+            if not page:
+                break
+            pages.extend(page)
+            after = page[-1]
+        # End while
+        
+        self.assertEqual(expectedOutput, pages)
+        self.assertEqual(expectedOutput[3:4], mks.isorted_window(self.sampleData, 1, 1, *myKeys, after=expectedOutput[1]))
+        self.assertRaises(ValueError, mks.isorted_window, self.sampleData, -1, 2, 'age')
+    # End test_sorted_window
+    
+    
+    def test_grouped_sorted(self):
+        import multi_key_sort as mks
+        from itertools import groupby
+        from operator import itemgetter
+        
+        expectedOutput = [(k, list(g)) for k, g in groupby(mks.isorted(self.sampleData, '-sex', 'age', 'name desc'), itemgetter('sex'))]
+        self.assertEqual(expectedOutput, mks.grouped_sorted(self.sampleData, ['-sex'], ['age', 'name desc']))
+        self.assertEqual([g[0] for k, g in expectedOutput], mks.distinct_on(self.sampleData, '-sex', ['age', 'name desc']))
+        
+        expectedOutput = [(k, list(g)) for k, g in groupby(mks.isorted(self.sampleData, 'age', 'sex'), itemgetter('age', 'sex'))]
+        self.assertEqual(expectedOutput, mks.grouped_sorted(self.sampleData, ['age', 'sex']))
+        self.assertEqual([self.sampleData[i] for i in (1, 5, 0, 3)], mks.distinct_on(self.sampleData, 'age'))
+        
+        # Unhashable group keys are grouped by sorting
+        myData = [{'tags': [x['sex']], 'name': x['name']} for x in self.sampleData]
+        expectedOutput = [(k, list(g)) for k, g in groupby(mks.isorted(myData, 'tags', 'name'), itemgetter('tags'))]
+        self.assertEqual(expectedOutput, mks.grouped_sorted(myData, 'tags', 'name'))
+        self.assertEqual([g[0] for k, g in expectedOutput], mks.distinct_on(myData, 'tags', 'name'))
+    # End test_grouped_sorted
+    
+    
+    def test_msort_mutable_sequence(self):
+        import multi_key_sort as mks
+        from array import array
+        from collections import deque
+        try:
+            from collections import UserList
+        except ImportError:
+            from UserList import UserList
+        
+        class SortableDeque(deque):
+            msort = mks.msort
+        # End class SortableDeque
+        
+        class SortableArray(array):
+            msort = mks.msort
+        # End class SortableArray
+        
+        class SortableUserList(UserList):
+            msort = mks.msort
+        # End class SortableUserList
+        
+        myData = SortableDeque(self.sampleData)
+        self.assertTrue(myData.msort('sex', 'age desc') is myData)
+        self.assertEqual(mks.isorted(self.sampleData, 'sex', 'age desc'), list(myData))
+        
+        myData = SortableArray('i', [5, 3, 9, 1, 3])
+        myData.msort()
+        self.assertEqual([1, 3, 3, 5, 9], list(myData))
+        
+        myData = SortableUserList(self.sampleData)
+        self.assertTrue(myData.msort('-age', 'name') is myData)
+        self.assertEqual(mks.isorted(self.sampleData, '-age', 'name'), list(myData))
+        
+        records = [dict(x, idx=i) for i, x in enumerate(self.sampleData * 500)]
+        myData = SortableDeque(records)
+        self.assertTrue(myData.msort('name', '-idx') is myData)
+        self.assertEqual(mks.isorted(records, 'name', '-idx'), list(myData))
+        
+        names = [x['name'] for x in self.sampleData]
+        ages = [x['age'] for x in self.sampleData]
+        order = mks.iargsort(self.sampleData, 'age', 'name')
+        mks.apply_permutation_in_place(order, names, ages)
+        self.assertEqual([(x['name'], x['age']) for x in mks.isorted(self.sampleData, 'age', 'name')], list(zip(names, ages)))
+    # End test_msort_mutable_sequence
+    
+    
+    def test_compact_sorted(self):
+        import multi_key_sort as mks
+        from operator import itemgetter
+        
+        for myKeys in [('age desc', 'name'), ('sex', '-age', 'name desc'), ('name ci', '-age'), ('-sex ci', 'age', 'name natural')]:
+            expectedOutput = mks.isorted(self.sampleData, *myKeys)
+            self.assertEqual(expectedOutput, mks.compact_sorted(self.sampleData, itemgetter, *myKeys))
+            self.assertEqual(list(mks.iargsort(self.sampleData, *myKeys)), list(mks.compact_argsort(iter(self.sampleData), itemgetter, *myKeys)))
+        # End for
+        
+        codes, size = mks.compact.encode_column(['b', 'a', 'c', 'a'], reverse=True)
+        self.assertEqual(([1, 2, 0, 2], 3), (list(codes), size))
+        self.assertEqual('B', codes.typecode)
+    # End test_compact_sorted
 # End class
 
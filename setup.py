@@ -23,4 +23,9 @@ setup(name='multi_key_sort',
       packages=find_packages(),
       include_package_data=True,
       zip_safe=False,
+      entry_points={
+        'console_scripts': [
+          'multi-key-sort = multi_key_sort.cli:main',
+          ],
+        },
       )